@@ -0,0 +1,37 @@
+""" Shared helpers for the benchmark scripts """
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = REPO_ROOT / "streamlit"
+
+
+def use_app_modules(api_url=None):
+    """ Make the app's top-level modules (utils, constants, ...) importable """
+    if api_url:
+        # Must be set before constants is first imported
+        os.environ["DDI_API_URL"] = api_url
+    if str(APP_DIR) not in sys.path:
+        sys.path.insert(0, str(APP_DIR))
+
+
+def time_calls(func, repeats):
+    """ Call func repeatedly and return the per-call latencies in milliseconds """
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarise(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[math.ceil(len(ordered) * 0.95) - 1], 3),
+    }
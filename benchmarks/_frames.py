@@ -0,0 +1,39 @@
+""" Synthetic combined side-effect frames for the table benchmarks """
+import numpy as np
+import pandas as pd
+
+FREQUENCIES = ['common or very common', 'uncommon', 'rare or very rare', 'frequency not known', 'unknown', None]
+
+
+def side_effect_frame(events=10_000, drugs=100, interaction_share=0.2, rows_per_drug=None, hlts=None, seed=0):
+    """ Rows shaped like join_interactions_and_side_effects output plus the ancestor column.
+
+    A share of the drug columns are 'a + b' interaction columns. Some (event, drug) pairs
+    repeat, some frequencies are missing and some events have no ancestor, as in the API data.
+    """
+    rng = np.random.default_rng(seed)
+    rows_per_drug = rows_per_drug or max(1, events // 5)
+    hlts = hlts or max(1, events // 8)
+    event_names = np.array([f"Event {i:05d}" for i in range(events)], dtype=object)
+    hlt_names = np.array([f"HLT {i:04d}" for i in range(hlts)], dtype=object)
+    ancestors = pd.Series(hlt_names[rng.integers(0, hlts, events)], index=event_names)
+    ancestors[rng.random(events) < 0.05] = None
+
+    n_interactions = int(drugs * interaction_share)
+    singles = [f"drug {i:03d}" for i in range(drugs - n_interactions)]
+    pairs = [f"{singles[i % len(singles)]} + {singles[(i * 7 + 1) % len(singles)]}" for i in range(n_interactions)]
+
+    frames = []
+    for drug in singles + pairs:
+        picked = event_names[rng.integers(0, events, rows_per_drug if ' + ' not in drug else max(1, rows_per_drug // 20))]
+        if ' + ' in drug:
+            frequency = np.full(len(picked), 'Not reported (Interaction Effect)', dtype=object)
+            source = 'interaction'
+        else:
+            frequency = np.array(FREQUENCIES, dtype=object)[rng.integers(0, len(FREQUENCIES), len(picked))]
+            source = 'BNF'
+        frames.append(pd.DataFrame({'drug_concept_name': drug, 'event_concept_name': picked,
+                                    'frequency': frequency, 'source': source}))
+    df = pd.concat(frames, ignore_index=True)
+    df['ancestor'] = df['event_concept_name'].map(ancestors)
+    return df
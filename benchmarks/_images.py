@@ -0,0 +1,22 @@
+""" Synthetic prescription images for the OCR benchmarks """
+import cv2
+import numpy as np
+
+LINES = ["Rx: amlodipine 5mg once daily", "simvastatin 40mg at night", "metformin 500mg twice daily"]
+
+
+def prescription_image(width=1200, lines=LINES):
+    """ Black text on white, scaled so the text keeps the same proportions at any width """
+    scale = width / 1200
+    height = int(width * 4 / 3)
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    for i, line in enumerate(lines):
+        origin = (int(60 * scale), int((150 + i * 120) * scale))
+        cv2.putText(img, line, origin, cv2.FONT_HERSHEY_SIMPLEX, 1.6 * scale, (0, 0, 0), max(1, int(3 * scale)))
+    return img
+
+
+def encode(img, ext=".jpg"):
+    ok, buf = cv2.imencode(ext, img)
+    assert ok
+    return buf.tobytes()
@@ -0,0 +1,72 @@
+""" Per-call latency of a bare requests.get versus the pooled api_call client.
+
+Runs against a throwaway local server so the numbers are reproducible offline. The shared
+response cache is cleared before every api_call, so each one goes over the pooled connection:
+
+    python benchmarks/bench_api_client.py --repeats 200
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from _common import use_app_modules, time_calls, summarise
+
+PAYLOADS = {
+    "interactions": [{"drug_a_concept_name": f"drug {i}", "drug_b_concept_name": f"drug {i + 1}",
+                      "event_concept_name": "Hypotension", "severity_code": 2} for i in range(50)],
+    "side_effects": [{"drug_concept_name": f"drug {i}", "event_concept_name": f"event {i}",
+                      "frequency": "uncommon", "source": "BNF"} for i in range(500)],
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Allow keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        endpoint = self.path.split("?")[0].strip("/")
+        body = json.dumps(PAYLOADS.get(endpoint, [])).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    use_app_modules(api_url=base_url)
+    from utils import api_call, get_response_cache
+
+    params = {"drug_list": [f"drug {i}" for i in range(20)]}
+    results = {}
+    for endpoint in PAYLOADS:
+        before = time_calls(lambda: requests.get(f"{base_url}/{endpoint}", params=params).json(), args.repeats)
+        def uncached():
+            # Measure the pooled request, not the response cache
+            get_response_cache().clear()
+            api_call(endpoint, params=params)
+
+        uncached()  # Open the pooled connection
+        after = time_calls(uncached, args.repeats)
+        results[endpoint] = {"before": summarise(before), "after": summarise(after)}
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+""" Recall and lookup latency of exact list membership versus DrugNameIndex.
+
+Queries are reference names with the kinds of damage seen in OCR output and MIMIC
+prescriptions: a misread character, a trailing dose, and a name split across fragments.
+Also checks that names from prescription records are matched with their doses but never
+to a near-miss name, which would be another drug.
+
+    python benchmarks/bench_drug_name_index.py --names 5000 --queries 500
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from _common import use_app_modules, summarise
+
+COMMON_NAMES = ["amlodipine", "simvastatin", "metformin", "atorvastatin", "lisinopril", "omeprazole",
+                "levothyroxine", "metoprolol tartrate", "insulin glargine", "warfarin", "clopidogrel",
+                "furosemide", "heparin sodium", "acetaminophen", "sodium chloride", "potassium chloride",
+                "prednisolone", "hydroxyzine", "hydralazine"]
+# Prescription names and the reference name they must match, or None where the nearest name is another drug
+RECORD_NAMES = [("Warfarin", "warfarin"), ("furosemide 40mg", "furosemide"),
+                ("Sodium Chloride 0.9%", "sodium chloride"), ("hydroxyzine 25 mg", "hydroxyzine"),
+                ("prednisone", None), ("hydralazin", None), ("insulin", None)]
+
+
+def synthetic_names(count, rng):
+    names = set(COMMON_NAMES)
+    while len(names) < count:
+        words = rng.choice([1, 1, 1, 2])
+        names.add(" ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12))) for _ in range(words)))
+    return sorted(names)
+
+
+def damage(name, kind, rng):
+    if kind == "misread":
+        i = rng.randrange(len(name))
+        return [name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]]
+    if kind == "dose":
+        return [f"{name.title()} {rng.choice([5, 10, 20, 500])}mg"]
+    words = name.split()
+    if kind == "split" and len(words) > 1:
+        return words
+    return [name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    use_app_modules()
+    from drug_name_index import DrugNameIndex
+
+    rng = random.Random(args.seed)
+    drug_names = synthetic_names(args.names, rng)
+    start = time.perf_counter()
+    index = DrugNameIndex(drug_names)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    results = {"build_ms": round(build_ms, 3)}
+    for kind in ("exact", "misread", "dose", "split"):
+        pool = [name for name in drug_names if " " in name] if kind == "split" else drug_names
+        queries = [(name, damage(name, kind, rng)) for name in rng.choices(pool, k=args.queries)]
+
+        # Previous behaviour: each fragment lower-cased and looked up in the list
+        before_hits, before_ms = 0, []
+        for name, fragments in queries:
+            t = time.perf_counter()
+            found = [fragment.lower() for fragment in fragments if fragment.lower() in drug_names]
+            before_ms.append((time.perf_counter() - t) * 1000)
+            before_hits += name in found
+
+        after_hits, after_ms = 0, []
+        for name, fragments in queries:
+            t = time.perf_counter()
+            found = index.find_names(fragments)
+            after_ms.append((time.perf_counter() - t) * 1000)
+            after_hits += name in found
+
+        results[kind] = {
+            "before": {"recall": round(before_hits / len(queries), 3), **summarise(before_ms)},
+            "after": {"recall": round(after_hits / len(queries), 3), **summarise(after_ms)},
+        }
+
+    for text, name in RECORD_NAMES:
+        assert index.match_record(text) == name, f"expected {text!r} to match {name!r}"
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
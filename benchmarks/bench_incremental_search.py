@@ -0,0 +1,79 @@
+""" Requests, bytes and wall time of a search and of the +1 / -1 drug edits that follow it,
+whole-list API calls versus the per-drug and per-pair cached fetches.
+
+Runs against the local mock API, checking both return the same rows:
+
+    python benchmarks/bench_incremental_search.py --drugs 50 --delay-ms 50
+"""
+import argparse
+import json
+import time
+
+from _common import use_app_modules
+from mock_api import start_mock_api
+
+
+def _rows(rows):
+    return sorted(json.dumps(row, sort_keys=True) for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=50, help="Portfolio size before the edit")
+    parser.add_argument("--delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server = start_mock_api(latency_ms=args.delay_ms)
+    use_app_modules(api_url=server.url)
+    import utils
+    from utils import api_call, fetch_ancestors, fetch_interactions, fetch_side_effects
+    from constants import vaccine_list
+
+    portfolio = server.data.drug_names[:args.drugs]
+    edits = {
+        "search": portfolio,
+        "add one drug": [*portfolio, server.data.drug_names[args.drugs]],
+        "remove one drug": portfolio[1:],
+    }
+
+    def whole_list(drugs):
+        interactions = api_call("interactions", params={"drug_list": [*drugs, *vaccine_list]})
+        side_effects = api_call("side_effects", params={"drug_list": drugs})
+        ancestors = api_call("ancestor_side_effects", params={"pt_list": [item["event_concept_name"] for item in side_effects]})
+        return interactions, side_effects, ancestors
+
+    def cached(drugs):
+        interactions = fetch_interactions([*drugs, *vaccine_list])
+        side_effects = fetch_side_effects(drugs)
+        ancestors = fetch_ancestors([item["event_concept_name"] for item in side_effects])
+        return interactions, side_effects, ancestors
+
+    def measure(fetch, drugs):
+        server.reset_stats()
+        start = time.perf_counter()
+        result = fetch(drugs)
+        wall_ms = (time.perf_counter() - start) * 1000
+        stats = server.stats()
+        return result, {"wall_ms": round(wall_ms, 3), "api_calls": stats["total_requests"],
+                        "api_bytes": stats["total_bytes"], "api_calls_by_endpoint": stats["requests"]}
+
+    results = {"portfolio_size": len(portfolio), "delay_ms": args.delay_ms, "steps": {}}
+    for fetch_name, fetch in (("before", whole_list), ("after", cached)):
+        utils.get_response_cache().clear()
+        for step, drugs in edits.items():
+            result, measured = measure(fetch, drugs)
+            results["steps"].setdefault(step, {})[fetch_name] = measured
+            results["steps"][step].setdefault("_result", []).append(result)
+
+    for step in results["steps"].values():
+        (interactions, side_effects, ancestors), (interactions_after, side_effects_after, ancestors_after) = step.pop("_result")
+        assert _rows(interactions) == _rows(interactions_after), "interaction rows differ"
+        assert _rows(side_effects) == _rows(side_effects_after), "side effect rows differ"
+        assert ancestors == ancestors_after, "ancestors differ"
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+""" Latency of the interaction lookup of a search, the per-pair cached API fetch versus the
+in-process index of a local snapshot.
+
+Writes the snapshot from the local mock API as the refresh command does, checks it holds
+every interaction exactly once and that both lookups return the same rows in the same order.
+Also checks that a snapshot missing some drugs still gives every interaction, and that a
+rewritten snapshot is loaded by the running app:
+
+    python benchmarks/bench_interaction_index.py --catalogue 800 --sizes 5 20 50 --delay-ms 50
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from _common import use_app_modules, time_calls, summarise
+from mock_api import SyntheticData, start_mock_api
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--catalogue", type=int, default=800, help="Drugs known to the mock API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50], help="Portfolio sizes")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_mock_api(SyntheticData(drugs=args.catalogue), latency_ms=args.delay_ms)
+    path = Path(tempfile.mkdtemp()) / "interactions"
+    os.environ["DDI_INTERACTION_SNAPSHOT"] = str(path)
+    use_app_modules(api_url=server.url)
+    import utils
+    from utils import fetch_interactions
+    from constants import LIFESTYLE_FACTORS, vaccine_list
+    from interaction_index import (InteractionIndex, build_interaction_snapshot, fetch_all_interactions,
+                                   get_interaction_index, screen_interactions)
+    from snapshot import read_snapshot
+
+    assert get_interaction_index() is None, "expected no index before the snapshot is written"
+    names = [*server.data.drug_names, *LIFESTYLE_FACTORS, *vaccine_list]
+    start = time.perf_counter()
+    rows = fetch_all_interactions(names, chunk_size=100)
+    build_interaction_snapshot(rows, path, names)
+    results = {
+        "catalogue": args.catalogue,
+        "delay_ms": args.delay_ms,
+        "snapshot": {
+            "rows": len(rows),
+            "bytes": sum(file.stat().st_size for file in path.iterdir()),
+            "refresh_ms": round((time.perf_counter() - start) * 1000, 3),
+        },
+        "sizes": {},
+    }
+    utils.get_response_cache().clear()
+    everything = server.data.interactions(drug_list=names)
+    assert sorted(map(json.dumps, rows)) == sorted(map(json.dumps, everything)), "snapshot rows differ"
+
+    start = time.perf_counter()
+    index = InteractionIndex(*read_snapshot(path))
+    results["snapshot"]["load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        drugs = [*rng.sample(server.data.drug_names, size), *LIFESTYLE_FACTORS[:2], *vaccine_list]
+
+        def remote():
+            utils.get_response_cache().clear()
+            return fetch_interactions(drugs)
+
+        assert index.interactions(drugs) == remote(), "interaction rows differ"
+        results["sizes"][size] = {
+            "before": summarise(time_calls(remote, args.repeats)),
+            "after": summarise(time_calls(lambda: index.interactions(drugs), args.repeats)),
+            "rows": len(index.interactions(drugs)),
+        }
+
+    # A snapshot written before the first drugs were added to the dataset
+    newcomers = set(server.data.drug_names[:args.catalogue // 10])
+    stale_path = path.with_name("stale")
+    build_interaction_snapshot(
+        [row for row in rows if not {row["drug_a_concept_name"], row["drug_b_concept_name"]} & newcomers],
+        stale_path, [name for name in names if name not in newcomers])
+    stale = InteractionIndex(*read_snapshot(stale_path))
+    drugs = [*rng.sample(sorted(newcomers), 5), *rng.sample(server.data.drug_names, 45), *vaccine_list]
+    screened = screen_interactions(stale, drugs)
+    assert sorted(map(json.dumps, screened)) == sorted(map(json.dumps, fetch_interactions(drugs))), \
+        "interactions of drugs missing from the snapshot differ"
+    results["stale_snapshot"] = {"unknown_drugs": len(stale.unknown(drugs)), "rows": len(screened),
+                                 "rows_fetched": len(screened) - len(stale.interactions(drugs))}
+
+    loaded = get_interaction_index()
+    build_interaction_snapshot(rows, path, names)
+    assert get_interaction_index() is not loaded, "expected the rewritten snapshot to be loaded"
+    assert get_interaction_index() is get_interaction_index(), "expected one index per snapshot"
+    assert len(list(path.parent.glob("interactions.[0-9]*"))) == 2, "expected the two latest versions to be kept"
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
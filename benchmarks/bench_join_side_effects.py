@@ -0,0 +1,90 @@
+""" Time and peak memory of joining interaction rows onto the side-effect rows, baseline
+row-wise apply and double copy versus the vectorised single-copy join.
+
+Checks both produce the same frame first:
+
+    python benchmarks/bench_join_side_effects.py --interactions 20000 --side-effects 150000
+"""
+import argparse
+import json
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from _common import use_app_modules, time_calls, summarise
+from _frames import side_effect_frame
+
+
+def legacy_join(interactions_df, side_effects_df):
+    """ The baseline utils.join_interactions_and_side_effects """
+    interactions_side_effects = pd.DataFrame({
+        'drug_concept_name': interactions_df.apply(
+            lambda x: f"{x['drug_a_concept_name']} + {x['drug_b_concept_name']}",
+            axis=1
+        ),
+        'event_concept_name': interactions_df['event_concept_name'],
+        'frequency': 'Not reported (Interaction Effect)',
+        'source': 'interaction',
+        'severity_code': interactions_df['severity_code']
+    })
+    return pd.concat([interactions_side_effects, side_effects_df], ignore_index=True)
+
+
+def interaction_frame(rows, drugs=200, events=5000, seed=0):
+    """ Rows shaped like the interactions response, restricted to DDI_COLUMNS """
+    rng = np.random.default_rng(seed)
+    drug_names = np.array([f"drug {i:03d}" for i in range(drugs)], dtype=object)
+    event_names = np.array([f"Event {i:05d}" for i in range(events)], dtype=object)
+    severity = rng.integers(1, 5, rows)
+    return pd.DataFrame({
+        'drug_a_concept_name': drug_names[rng.integers(0, drugs, rows)],
+        'drug_b_concept_name': drug_names[rng.integers(0, drugs, rows)],
+        'event_concept_name': event_names[rng.integers(0, events, rows)],
+        'severity_bnf': np.array(['Mild', 'Moderate', 'Severe', 'Severe'], dtype=object)[severity - 1],
+        'severity_ansm': None,
+        'severity_code': severity,
+        'evidence': 'Study',
+        'description': 'May interact.',
+    })
+
+
+def memory_mb(func):
+    """ Memory held by the result and the peak allocated while building it """
+    tracemalloc.start()
+    result = func()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"result_mb": round(held / 2 ** 20, 1), "peak_alloc_mb": round(peak / 2 ** 20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interactions", type=int, default=20_000)
+    parser.add_argument("--side-effects", type=int, default=150_000, help="Approximate side effect rows")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    use_app_modules()
+    from constants import SIDE_EFFECT_COLUMNS
+    from utils import join_interactions_and_side_effects
+
+    interactions_df = interaction_frame(args.interactions)
+    side_effects_df = side_effect_frame(events=args.side_effects // 16, drugs=100, interaction_share=0)
+    side_effects_df = side_effects_df[[*SIDE_EFFECT_COLUMNS, 'ancestor']]
+
+    pd.testing.assert_frame_equal(join_interactions_and_side_effects(interactions_df, side_effects_df),
+                                  legacy_join(interactions_df, side_effects_df))
+
+    results = {"interaction_rows": len(interactions_df), "side_effect_rows": len(side_effects_df)}
+    for name, join in (("before", legacy_join), ("after", join_interactions_and_side_effects)):
+        results[name] = {
+            **summarise(time_calls(lambda: join(interactions_df, side_effects_df), args.repeats)),
+            **memory_mb(lambda: join(interactions_df, side_effects_df)),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+""" OCR latency and peak memory versus photo size, with and without pre-processing.
+
+Each measurement runs in a fresh process so peak RSS is not shared between runs:
+
+    python benchmarks/bench_ocr_preprocess.py --widths 1200 2400 4000
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+
+from _common import use_app_modules
+from _images import prescription_image, encode
+
+
+def _measure(mode, width):
+    use_app_modules()
+    import cv2
+    import numpy as np
+    from ocr import get_ocr_reader, prepare_image
+
+    reader = get_ocr_reader()
+    image_bytes = encode(prescription_image(width))
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if mode == "before":
+        # Previous behaviour: full resolution detection, then a second decode for display
+        reader.readtext(image_bytes)
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    else:
+        img = prepare_image(image_bytes)
+        reader.readtext(img)
+    cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"ms": round(latency_ms, 3), "peak_rss_mb": round(peak_kb / 1024, 1),
+            "peak_growth_mb": round((peak_kb - baseline_kb) / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--widths", type=int, nargs="+", default=[1200, 2400, 4000])
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for width in args.widths:
+        results[f"{width}px"] = {}
+        for mode in ("before", "after"):
+            with ctx.Pool(1) as pool:
+                results[f"{width}px"][mode] = pool.apply(_measure, (mode, width))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+""" Time to first detection for a cold upload (reader built per upload) versus the shared reader.
+
+    python benchmarks/bench_ocr_reader.py --repeats 3
+"""
+import argparse
+import json
+import time
+
+from _common import use_app_modules, time_calls, summarise
+from _images import prescription_image, encode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    use_app_modules()
+    import easyocr
+    from constants import OCR_LANGUAGES
+    from ocr import get_ocr_reader, warm_up_ocr_reader
+
+    image_bytes = encode(prescription_image())
+
+    # Previous behaviour: every new upload builds its own reader
+    cold = time_calls(lambda: easyocr.Reader(OCR_LANGUAGES).readtext(image_bytes), args.repeats)
+
+    start = time.perf_counter()
+    warm_up_ocr_reader()
+    warm_up_ms = (time.perf_counter() - start) * 1000
+
+    warm = time_calls(lambda: get_ocr_reader().readtext(image_bytes), args.repeats)
+
+    print(json.dumps({
+        "before": summarise(cold),
+        "after": summarise(warm),
+        "warm_up_ms": round(warm_up_ms, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+""" Wall time, API calls, bytes and peak RSS of scripted page reruns, per portfolio size.
+
+Drives the pages with Streamlit's AppTest against the local mock API, starting each
+portfolio size from empty caches, and prints (or writes) the results as JSON. Each step
+also records the shared API response cache counters, and each run checks the reference
+lists were fetched once however many sessions and reruns asked for them:
+
+    python benchmarks/bench_page_reruns.py --sizes 5 20 50 --latency-ms 50 --output reruns.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import time
+
+from _common import REPO_ROOT, APP_DIR, use_app_modules
+from mock_api import SyntheticData, start_mock_api
+
+PATIENT_ID = 249
+
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Session:
+    """ One scripted AppTest session, recording a measurement per rerun """
+
+    def __init__(self, page, server, timeout, cache_stats):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(str(APP_DIR / page), default_timeout=timeout)
+        self.server = server
+        self.cache_stats = cache_stats
+        self.steps = []
+        self.failed = False
+        # AppTest renders a page with a syntax error as an empty page with no exception
+        try:
+            compile((APP_DIR / page).read_text(), page, "exec")
+            self.compile_error = None
+        except SyntaxError as error:
+            self.compile_error = f"Page does not compile: {error!r}"
+
+    def step(self, name, action=None):
+        if self.failed:
+            return  # The widgets later steps need were never rendered
+        if self.compile_error:
+            self.failed = True
+            self.steps.append({"step": name, "error": self.compile_error})
+            return
+        self.server.reset_stats()
+        rss_before = _peak_rss_mb()
+        start = time.perf_counter()
+        if action is not None:
+            try:
+                action(self.at)
+            except (KeyError, IndexError, StopIteration) as error:
+                self.failed = True
+                self.steps.append({"step": name, "error": f"Widget not found: {error!r}"})
+                return
+        self.at.run()
+        wall_ms = (time.perf_counter() - start) * 1000
+        stats = self.server.stats()
+        self.steps.append({
+            "step": name,
+            "wall_ms": round(wall_ms, 3),
+            "api_calls": stats["total_requests"],
+            "api_bytes": stats["total_bytes"],
+            "api_calls_by_endpoint": stats["requests"],
+            "peak_rss_mb": _peak_rss_mb(),
+            "peak_rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+            "api_cache": self.cache_stats(),
+            "exceptions": [exception.value for exception in self.at.exception],
+        })
+        self.failed = bool(self.at.exception)
+
+
+def _find(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def prescription_explorer(server, data, drugs, timeout, cache_stats):
+    session = Session("Prescription_Explorer.py", server, timeout, cache_stats)
+    session.step("initial load")
+    session.step("select drugs", lambda at: at.multiselect(key="drug_multiselect").set_value(drugs))
+    session.step("search", lambda at: at.button(key="search_button").click())
+    session.step("group by HLT", lambda at: at.checkbox(key="hlt_checkbox_drugs").check())
+    session.step("ungroup HLT", lambda at: at.checkbox(key="hlt_checkbox_drugs").uncheck())
+
+    session.step("show interaction cards", lambda at: at.toggle(key="show_interactions_drugs").set_value(True))
+    details = [selectbox for selectbox in session.at.selectbox if selectbox.key and selectbox.key.startswith("details_drugs")]
+    if details and details[0].options:
+        session.step("open alternative search", lambda at: at.selectbox(key=details[0].key).set_value(0))
+        indications = [widget for widget in session.at.multiselect
+                       if widget.key and widget.key.startswith("indications_select_") and widget.options]
+        if indications:
+            select = indications[0]
+            session.step("find alternatives", lambda at: (
+                at.multiselect(key=select.key).set_value(select.options[:2]),
+                at.button(key=select.key.replace("indications_select_", "indication_search_")).click()))
+    session.step("idle rerun")
+
+    # A loaded patient replaces the drug selection with their prescriptions, so use a new session
+    patient = Session("Prescription_Explorer.py", server, timeout, cache_stats)
+    patient.step("initial load (patient session)")
+    patient.step("load patient", lambda at: (
+        at.selectbox(key="patient_id_input_0").set_value(PATIENT_ID),
+        _find(at.button, "Get Patient Information").click()))
+    return session.steps + patient.steps
+
+
+def culprit_drugs(server, data, drugs, timeout, cache_stats):
+    barkla = [drug for drug in drugs if drug in set(data.barkla_drug_names)] or data.barkla_drug_names[:len(drugs)]
+    faers = [drug for drug in drugs if drug in set(data.faers_drug_names)] or data.faers_drug_names[:len(drugs)]
+    session = Session("pages/Culprit_Drugs.py", server, timeout, cache_stats)
+    session.step("initial load")
+    session.step("search culprits", lambda at: (
+        at.multiselect(key="selected_drugs_A").set_value(barkla),
+        at.selectbox[0].set_value(data.barkla_side_effects_names[0]),
+        at.button(key="search_for_culprits").click()))
+    session.step("search side effects", lambda at: (
+        at.multiselect(key="selected_drugs_B").set_value(barkla),
+        at.button(key="search_for_side_effects").click()))
+    session.step("search FAERS", lambda at: (
+        at.multiselect(key="selected_drugs_C").set_value(faers),
+        at.button(key="search_for_FAERS_side_effects").click()))
+    session.step("idle rerun")
+    return session.steps
+
+
+PAGES = {"Prescription_Explorer": prescription_explorer, "Culprit_Drugs": culprit_drugs}
+REFERENCE_LISTS = {"drug_names", "barkla_drug_names", "barkla_side_effects_names", "faers_drug_names"}
+
+
+def reference_fetches(steps):
+    """ Requests per reference list over a run, which the response cache should hold to one each """
+    fetches = {}
+    for step in steps:
+        for endpoint, count in step.get("api_calls_by_endpoint", {}).items():
+            if endpoint in REFERENCE_LISTS:
+                fetches[endpoint] = fetches.get(endpoint, 0) + count
+    return fetches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--pages", nargs="+", choices=sorted(PAGES), default=sorted(PAGES))
+    parser.add_argument("--drugs", type=int, default=3000, help="Size of the synthetic drug list")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results here as well as printing them")
+    args = parser.parse_args()
+
+    data = SyntheticData(drugs=args.drugs, seed=args.seed)
+    server = start_mock_api(data, latency_ms=args.latency_ms)
+    os.environ.setdefault("DDI_OCR_WARM_UP", "0")  # Loading the OCR models would dominate the first rerun
+    use_app_modules(api_url=server.url)
+    os.chdir(REPO_ROOT)  # The pages load their assets relative to the repository root
+    import streamlit as st
+    from utils import api_cache_stats
+
+    rng = random.Random(args.seed)
+    results = {"latency_ms": args.latency_ms, "drug_list_size": len(data.drug_names), "runs": []}
+    for size in args.sizes:
+        drugs = sorted(rng.sample(data.drug_names, size))
+        for page in args.pages:
+            # Each size starts cold, as a fresh server process would
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            steps = PAGES[page](server, data, drugs, args.timeout, api_cache_stats)
+            fetches = reference_fetches(steps)
+            results["runs"].append({"page": page, "portfolio_size": size, "steps": steps,
+                                    "reference_fetches": fetches,
+                                    "reference_lists_fetched_once": all(count == 1 for count in fetches.values())})
+
+    server.shutdown()
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
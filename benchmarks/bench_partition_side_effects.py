@@ -0,0 +1,77 @@
+""" Time to split the combined side-effect frame into drug, lifestyle and vaccine rows,
+baseline split-and-apply lambdas versus partition_side_effects, on synthetic names that mix
+case and pad parts with spaces. test_partition_side_effects.py checks both give the same frames:
+
+    python benchmarks/bench_partition_side_effects.py --events 10000 --drugs 100
+"""
+import argparse
+import json
+
+import numpy as np
+
+from _common import use_app_modules, time_calls, summarise
+from _frames import side_effect_frame
+
+
+def legacy_partition(side_effects_df, selected_factors, vaccines):
+    """ The baseline Prescription_Explorer partitioning """
+    lifestyle_side_effects_df = side_effects_df[
+        side_effects_df['drug_concept_name'].str.split(' + ').apply(
+            lambda x: any(factor.strip().lower() in y.strip().lower() for factor in selected_factors for y in x)
+        )
+    ]
+    vaccine_side_effects_df = side_effects_df[
+        side_effects_df['drug_concept_name'].str.split(' + ').apply(
+            lambda x: any(factor.strip().lower() in y.strip().lower() for factor in vaccines for y in x)
+        )
+    ]
+    drug_side_effects_df = side_effects_df.drop([*lifestyle_side_effects_df.index, *vaccine_side_effects_df.index])
+    return drug_side_effects_df, lifestyle_side_effects_df, vaccine_side_effects_df
+
+
+def with_factor_and_vaccine_names(df, factors, vaccines, seed=0):
+    """ Rename a share of the rows to pairs with factors and vaccines, in varied spellings """
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    others = np.array([*factors, *vaccines, *(name.upper() for name in factors), *(name.lower() for name in vaccines)],
+                      dtype=object)
+    drugs = df['drug_concept_name'].to_numpy(dtype=object)
+    picked = others[rng.integers(0, len(others), len(df))]
+    names = drugs.copy()
+    share = rng.random(len(df))
+    spellings = [(0.10, lambda drug, other: drug + ' + ' + other),
+                 (0.15, lambda drug, other: other + ' + ' + drug),
+                 (0.17, lambda drug, other: other + '  ' + drug),
+                 (0.18, lambda drug, other: ' ' + other + ' ')]
+    low = 0.0
+    for high, spell in spellings:
+        rows = (share >= low) & (share < high)
+        names[rows] = spell(drugs[rows], picked[rows])
+        low = high
+    df['drug_concept_name'] = names
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--drugs", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    use_app_modules()
+    from constants import LIFESTYLE_FACTORS, vaccine_list
+    from utils import partition_side_effects
+
+    df = with_factor_and_vaccine_names(side_effect_frame(events=args.events, drugs=args.drugs),
+                                       LIFESTYLE_FACTORS, vaccine_list)
+    results = {
+        "rows": len(df),
+        "before": summarise(time_calls(lambda: legacy_partition(df, LIFESTYLE_FACTORS, vaccine_list), args.repeats)),
+        "after": summarise(time_calls(lambda: partition_side_effects(df, LIFESTYLE_FACTORS, vaccine_list), args.repeats)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+""" Latency of a repeated search from another session, rebuilding the frames and tables from
+the cached API responses versus reading them from the shared search result cache.
+
+Runs against the local mock API. The repeat lists the drugs in reverse order, and is
+checked to give the same frames and tables as the first search and to be shared with
+the same search in upper case. Writing a new dataset version is checked to make the next
+search fetch everything again:
+
+    python benchmarks/bench_search_cache.py --drugs 20 --repeats 20
+"""
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from _common import use_app_modules, time_calls, summarise
+from mock_api import start_mock_api
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=20, help="Portfolio size")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server = start_mock_api(latency_ms=args.delay_ms)
+    version_file = Path(tempfile.mkdtemp()) / "data_version"
+    os.environ["DDI_DATA_VERSION_FILE"] = str(version_file)
+    use_app_modules(api_url=server.url)
+    import pandas as pd
+    from constants import LIFESTYLE_FACTORS, vaccine_list
+    from search_results import get_search_cache, search_cache_stats, search_portfolio
+
+    drugs = server.data.drug_names[:args.drugs]
+    repeat = drugs[::-1]
+    factors = LIFESTYLE_FACTORS[:2]
+
+    first, _ = search_portfolio(drugs, factors, vaccine_list)
+    assert first['complete'], "search failed"
+
+    def rebuilt():
+        # Every API response is cached by now, so this is the processing each session repeated
+        get_search_cache().clear()
+        search_portfolio(repeat, factors, vaccine_list)
+
+    def shared():
+        search_portfolio(repeat, factors, vaccine_list)
+
+    rebuilt()
+    results = {"portfolio_size": len(drugs), "before": summarise(time_calls(rebuilt, args.repeats))}
+    server.reset_stats()
+    results["after"] = summarise(time_calls(shared, args.repeats))
+    results["after_api_calls"] = server.stats()["total_requests"]
+    results["cache"] = search_cache_stats()
+
+    again, _ = search_portfolio(repeat, factors, vaccine_list)
+    assert again is not first, "expected a rebuilt entry"
+    assert search_portfolio([drug.upper() for drug in drugs], factors, vaccine_list)[0] is again, "expected a shared entry"
+    for name in ("interaction_sections", "side_effect_sections"):
+        for section, df in first[name].items():
+            pd.testing.assert_frame_equal(df, again[name][section])
+    for section, tables in first['side_effect_tables'].items():
+        for hlt, df in tables.items():
+            pd.testing.assert_frame_equal(df, again['side_effect_tables'][section][hlt])
+
+    version_file.write_text("2")
+    server.reset_stats()
+    updated, _ = search_portfolio(repeat, factors, vaccine_list)
+    assert updated is not again, "expected a new entry for the new dataset version"
+    results["api_calls_after_new_version"] = server.stats()["requests"]
+    assert {"interactions", "side_effects", "ancestor_side_effects"} <= set(results["api_calls_after_new_version"]), \
+        "expected the lookups to be fetched again"
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
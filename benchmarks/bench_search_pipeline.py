@@ -0,0 +1,76 @@
+""" End-to-end latency of the post-search fetches, serial versus api_pipeline.
+
+Runs against the local mock API with a fixed delay added to every request to stand
+in for the round trip to the hosted API:
+
+    python benchmarks/bench_search_pipeline.py --delay-ms 200 --repeats 10
+"""
+import argparse
+import json
+
+from _common import use_app_modules, time_calls, summarise
+from mock_api import start_mock_api
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay-ms", type=float, default=200)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--drugs", type=int, default=20, help="Portfolio size")
+    args = parser.parse_args()
+
+    server = start_mock_api(latency_ms=args.delay_ms)
+
+    use_app_modules(api_url=server.url)
+    import utils
+    from utils import api_call, api_pipeline
+
+    drug_list = server.data.drug_names[:args.drugs]
+
+    def interaction_drugs(interactions):
+        return sorted({item["drug_a_concept_name"] for item in interactions} |
+                      {item["drug_b_concept_name"] for item in interactions})
+
+    def serial():
+        interactions = api_call("interactions", params={"drug_list": drug_list})
+        api_call("indications", params={"drug_list": interaction_drugs(interactions)})
+        side_effects = api_call("side_effects", params={"drug_list": drug_list})
+        api_call("ancestor_side_effects", params={"pt_list": [item["event_concept_name"] for item in side_effects]})
+
+    stage_timings = []
+
+    def pipeline():
+        _, timings = api_pipeline({
+            "interactions": (lambda: api_call("interactions", params={"drug_list": drug_list}, show_error=False), []),
+            "side_effects": (lambda: api_call("side_effects", params={"drug_list": drug_list}, show_error=False), []),
+            "indications": (lambda interactions: api_call(
+                "indications", params={"drug_list": interaction_drugs(interactions)}, show_error=False), ["interactions"]),
+            "ancestor_side_effects": (lambda side_effects: api_call(
+                "ancestor_side_effects", params={"pt_list": [item["event_concept_name"] for item in side_effects]},
+                show_error=False), ["side_effects"]),
+        })
+        stage_timings.append(timings)
+
+    def uncached(func):
+        # Measure the network path, not the shared response cache
+        def run():
+            utils.get_response_cache().clear()
+            func()
+        return run
+
+    uncached(serial)()  # Open the pooled connections
+    results = {
+        "before": summarise(time_calls(uncached(serial), args.repeats)),
+        "after": summarise(time_calls(uncached(pipeline), args.repeats)),
+        "after_stages_mean_ms": {
+            name: round(sum(timings[name] for timings in stage_timings) / len(stage_timings), 3)
+            for name in stage_timings[0]
+        },
+    }
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+""" Latency of the side effect and HLT lookups of a search, the per-drug and per-term cached
+API fetches versus the memory-mapped local snapshot.
+
+Writes the snapshot from the local mock API as the refresh command does, and checks both
+lookups return the same rows in the same order and the same ancestors. Also checks that a
+snapshot missing some drugs still gives every side effect and ancestor, and that a
+rewritten snapshot is loaded by the running app:
+
+    python benchmarks/bench_side_effect_index.py --catalogue 800 --sizes 5 20 50 --delay-ms 50
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from _common import use_app_modules, time_calls, summarise
+from mock_api import SyntheticData, start_mock_api
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--catalogue", type=int, default=800, help="Drugs known to the mock API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50], help="Portfolio sizes")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_mock_api(SyntheticData(drugs=args.catalogue), latency_ms=args.delay_ms)
+    path = Path(tempfile.mkdtemp()) / "side_effects"
+    os.environ["DDI_SIDE_EFFECT_SNAPSHOT"] = str(path)
+    use_app_modules(api_url=server.url)
+    import utils
+    from utils import fetch_ancestors, fetch_side_effects
+    from constants import LIFESTYLE_FACTORS
+    from side_effect_index import (SideEffectIndex, build_side_effect_snapshot, fetch_all_ancestors,
+                                   fetch_all_side_effects, get_side_effect_index, screen_ancestors,
+                                   screen_side_effects)
+    from snapshot import read_snapshot
+
+    assert get_side_effect_index() is None, "expected no index before the snapshot is written"
+    names = [*server.data.drug_names, *LIFESTYLE_FACTORS]
+    start = time.perf_counter()
+    side_effects = fetch_all_side_effects(names)
+    all_ancestors = fetch_all_ancestors([row["event_concept_name"] for row in side_effects])
+    build_side_effect_snapshot(side_effects, all_ancestors, path, names)
+    results = {
+        "catalogue": args.catalogue,
+        "delay_ms": args.delay_ms,
+        "snapshot": {
+            "rows": len(side_effects),
+            "bytes": sum(file.stat().st_size for file in path.iterdir()),
+            "refresh_ms": round((time.perf_counter() - start) * 1000, 3),
+        },
+        "sizes": {},
+    }
+
+    start = time.perf_counter()
+    index = SideEffectIndex(*read_snapshot(path))
+    results["snapshot"]["load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        drugs = [*rng.sample(server.data.drug_names, size), *LIFESTYLE_FACTORS[:2]]
+
+        def remote():
+            utils.get_response_cache().clear()
+            rows = fetch_side_effects(drugs)
+            return rows, fetch_ancestors([row["event_concept_name"] for row in rows])
+
+        def local():
+            rows = index.side_effects(drugs)
+            return rows, index.ancestors([row["event_concept_name"] for row in rows])
+
+        rows, ancestors = remote()
+        assert local() == (rows, ancestors), "side effects or ancestors differ"
+        events = list(dict.fromkeys(row["event_concept_name"] for row in rows))
+        results["sizes"][size] = {
+            "before": summarise(time_calls(remote, args.repeats)),
+            "after": summarise(time_calls(local, args.repeats)),
+            "rows": len(rows),
+            "ancestor_query_bytes": len(urlencode({"pt_list": events}, doseq=True)),
+        }
+
+    # A snapshot written before the first drugs were added to the dataset
+    newcomers = set(server.data.drug_names[:args.catalogue // 10])
+    kept = [row for row in side_effects if row["drug_concept_name"] not in newcomers]
+    stale_path = path.with_name("stale")
+    build_side_effect_snapshot(kept, all_ancestors, stale_path, [name for name in names if name not in newcomers])
+    stale = SideEffectIndex(*read_snapshot(stale_path))
+    drugs = [*rng.sample(sorted(newcomers), 5), *rng.sample(server.data.drug_names, 45), *LIFESTYLE_FACTORS[:2]]
+    utils.get_response_cache().clear()
+    screened = screen_side_effects(stale, drugs)
+    events = [row["event_concept_name"] for row in screened]
+    assert sorted(map(json.dumps, screened)) == sorted(map(json.dumps, fetch_side_effects(drugs))), \
+        "side effects of drugs missing from the snapshot differ"
+    results["stale_snapshot"] = {"unknown_drugs": len(stale.unknown(drugs)), "rows": len(screened),
+                                 "rows_fetched": len(screened) - len(stale.side_effects(drugs))}
+
+    # A snapshot written before the first side effects were added to the dataset
+    new_events = set(server.data.events[:len(server.data.events) // 10])
+    kept = [row for row in side_effects if row["event_concept_name"] not in new_events]
+    build_side_effect_snapshot(kept, all_ancestors, stale_path, names)
+    stale = SideEffectIndex(*read_snapshot(stale_path))
+    assert screen_ancestors(stale, events) == fetch_ancestors(events), \
+        "ancestors of side effects missing from the snapshot differ"
+    results["stale_snapshot"]["unknown_events"] = len(stale.unknown_events(events))
+
+    loaded = get_side_effect_index()
+    build_side_effect_snapshot(side_effects, all_ancestors, path, names)
+    assert get_side_effect_index() is not loaded, "expected the rewritten snapshot to be loaded"
+    assert get_side_effect_index() is get_side_effect_index(), "expected one index per snapshot"
+    assert len(list(path.parent.glob("side_effects.[0-9]*"))) == 2, "expected the two latest versions to be kept"
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+""" Styling and render time of the side-effect tables, baseline per-column Styler.map loop
+versus the single style pass, on the full table and on one page of it.
+
+Checks the new cell colours against the baseline first:
+
+    python benchmarks/bench_side_effect_styles.py --events 10000 --drugs 100
+"""
+import argparse
+import json
+
+import numpy as np
+
+from _common import use_app_modules, time_calls, summarise
+from _frames import side_effect_frame
+
+
+def legacy_styler(df, hlt):
+    """ The baseline display_side_effects_table styling """
+    from constants import frequency_colour_map
+
+    def style_cell(val):
+        if hlt:
+            for f in frequency_colour_map.keys():
+                if f in val:
+                    return f'background-color: {frequency_colour_map[f]}59'
+            return ''
+        if val in frequency_colour_map:
+            return f'background-color: {frequency_colour_map[val]}59'
+        return ''
+
+    styled_df = df.style
+    for column in df.columns:
+        if column != 'Total Frequency Score':
+            styled_df = styled_df.map(style_cell, subset=[column])
+    return styled_df
+
+
+def current_styler(df):
+    from components.side_effects_tab.display_side_effects import cell_styles, TOTAL_COLUMN
+    return df.style.apply(cell_styles, axis=None, subset=[column for column in df.columns if column != TOTAL_COLUMN])
+
+
+def _styles(styler):
+    styler._compute()
+    return dict(styler.ctx)
+
+
+def differences(before, after):
+    """ Cells coloured differently; for grouped tables the baseline matched count digits too,
+    e.g. coloured "1 (x3)" as a 3 """
+    return sum(before.get(cell) != after.get(cell) for cell in set(before) | set(after))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--drugs", type=int, default=100)
+    parser.add_argument("--page-rows", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    use_app_modules()
+    from components.side_effects_tab.process_side_effects import process_side_effects, process_side_effects_hlt
+
+    df = side_effect_frame(events=args.events, drugs=args.drugs)
+    results = {}
+    for name, build, hlt in (("events", process_side_effects, False), ("hlt", process_side_effects_hlt, True)):
+        table = build(df)
+        before, after = _styles(legacy_styler(table, hlt)), _styles(current_styler(table))
+        if not hlt:
+            assert before == after, "cell colours differ from the baseline"
+        results[name] = {
+            "rows": len(table),
+            "cells": int(np.prod(table.shape)),
+            "cells_recoloured": differences(before, after),
+            "style_before": summarise(time_calls(lambda: _styles(legacy_styler(table, hlt)), args.repeats)),
+            "style_after": summarise(time_calls(lambda: _styles(current_styler(table)), args.repeats)),
+            "render_before": summarise(time_calls(lambda: legacy_styler(table, hlt).to_html(), args.repeats)),
+            "render_after_page": summarise(time_calls(
+                lambda: current_styler(table.iloc[:args.page_rows]).to_html(), args.repeats)),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+""" Build time of the side-effect tables, baseline pivot_table code versus the current builders.
+
+Checks that both produce identical tables before timing them, also for a frame where no
+frequency has a score. Where some frequencies have no score, the baseline HLT cells list
+their scores in hash order rather than ascending, so for that frame the HLT cells are
+compared as sets of "score (xcount)" parts:
+
+    python benchmarks/bench_side_effect_tables.py --events 10000 --drugs 100
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from _common import use_app_modules, time_calls, summarise
+from _frames import side_effect_frame
+
+
+def _cell_parts(table):
+    return table.map(lambda cell: frozenset(cell.split(', ')) if isinstance(cell, str) else cell)
+
+
+def check_equal(name, after, before, all_scored):
+    if name == "process_side_effects_hlt" and not all_scored:
+        after, before = _cell_parts(after), _cell_parts(before)
+    pd.testing.assert_frame_equal(after, before)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--drugs", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    use_app_modules()
+    import _legacy_side_effects as legacy
+    from components.side_effects_tab import process_side_effects as current
+
+    df = side_effect_frame(events=args.events, drugs=args.drugs)
+    scored = df[df['frequency'].notna()].reset_index(drop=True)
+    unscored = df.assign(frequency=None)
+    results = {"rows": len(df)}
+    for name in ("process_side_effects", "process_side_effects_hlt"):
+        before, after = getattr(legacy, name), getattr(current, name)
+        check_equal(name, after(scored), before(scored), all_scored=True)
+        check_equal(name, after(df), before(df), all_scored=False)
+        check_equal(name, after(unscored), before(unscored), all_scored=False)
+        results[name] = {
+            "before": summarise(time_calls(lambda: before(df), args.repeats)),
+            "after": summarise(time_calls(lambda: after(df), args.repeats)),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+""" Memory held per session by the interaction and side-effect frames of one search, object
+columns from pd.DataFrame versus the typed loaders.
+
+Fetches a portfolio from the local mock API, builds the frames both ways, checks the side
+effect tables come out the same and reports each frame's deep memory usage:
+
+    python benchmarks/bench_typed_frames.py --drugs 50
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from _common import use_app_modules
+from bench_join_side_effects import legacy_join
+from bench_partition_side_effects import legacy_partition
+from mock_api import start_mock_api
+
+
+def _mb(df):
+    return round(df.memory_usage(deep=True).sum() / 2 ** 20, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=50, help="Portfolio size")
+    parser.add_argument("--side-effects-per-drug", type=int, default=None,
+                        help="Override the mock API's side effects per drug")
+    args = parser.parse_args()
+
+    server = start_mock_api()
+    if args.side_effects_per_drug:
+        server.data.side_effects_per_drug = args.side_effects_per_drug
+    use_app_modules(api_url=server.url)
+    from constants import DDI_COLUMNS, SIDE_EFFECT_COLUMNS, LIFESTYLE_FACTORS, vaccine_list
+    from utils import (fetch_ancestors, fetch_interactions, fetch_side_effects, join_interactions_and_side_effects,
+                       load_interactions, load_side_effects, partition_side_effects)
+    from components.side_effects_tab.process_side_effects import process_side_effects, process_side_effects_hlt
+
+    drugs = [*server.data.drug_names[:args.drugs], *LIFESTYLE_FACTORS]
+    interactions = fetch_interactions([*drugs, *vaccine_list])
+    side_effects = fetch_side_effects(drugs)
+    ancestors = fetch_ancestors([item["event_concept_name"] for item in side_effects])
+    server.shutdown()
+
+    def before():
+        interactions_df = pd.DataFrame(interactions)[DDI_COLUMNS]
+        side_effects_df = pd.DataFrame(side_effects)[SIDE_EFFECT_COLUMNS]
+        side_effects_df["ancestor"] = side_effects_df["event_concept_name"].map(ancestors)
+        joined = legacy_join(interactions_df, side_effects_df)
+        return interactions_df, side_effects_df, joined, legacy_partition(joined, LIFESTYLE_FACTORS, vaccine_list)
+
+    def after():
+        interactions_df = load_interactions(interactions)
+        side_effects_df = load_side_effects(side_effects, ancestors)
+        joined = join_interactions_and_side_effects(interactions_df, side_effects_df)
+        return interactions_df, side_effects_df, joined, partition_side_effects(joined, LIFESTYLE_FACTORS, vaccine_list)
+
+    results = {"portfolio_size": args.drugs, "interaction_rows": len(interactions), "side_effect_rows": len(side_effects)}
+    frames = {"before": before(), "after": after()}
+    (_, _, _, (drug_before, lifestyle_before, _)), (_, _, _, (drug_after, lifestyle_after, _)) = frames.values()
+    pd.testing.assert_frame_equal(process_side_effects(drug_after), process_side_effects(drug_before))
+    pd.testing.assert_frame_equal(process_side_effects_hlt(drug_after), process_side_effects_hlt(drug_before))
+    if len(lifestyle_before):
+        pd.testing.assert_frame_equal(process_side_effects(lifestyle_after), process_side_effects(lifestyle_before))
+
+    for name, (interactions_df, side_effects_df, joined, partitions) in frames.items():
+        sizes = {
+            "interactions_mb": _mb(interactions_df),
+            "side_effects_mb": _mb(side_effects_df),
+            "joined_mb": _mb(joined),
+            "partitions_mb": round(sum(_mb(part) for part in partitions), 2),
+        }
+        sizes["session_total_mb"] = round(sum(sizes.values()), 2)
+        results[name] = sizes
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
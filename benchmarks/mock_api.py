@@ -0,0 +1,406 @@
+""" Local stand-in for the DDI FastAPI service, for offline benchmarking and load testing.
+
+Serves every endpoint the app calls from deterministic synthetic data that scales with
+--drugs / --events, with an optional injected delay per request:
+
+    python benchmarks/mock_api.py --port 8000 --drugs 3000 --latency-ms 150
+    DDI_API_URL=http://127.0.0.1:8000 streamlit run streamlit/Prescription_Explorer.py
+
+Responses can be recorded to a JSON lines fixture file with --record and served back
+with --replay, so a run can be repeated against exactly the same payloads.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+FREQUENCIES = ['common or very common', 'uncommon', 'rare or very rare', 'frequency not known']
+SEVERITIES = {1: ('Normal', 'A prendre en compte'), 2: ('Moderate', 'Precaution d\'emploi'),
+              3: ('Severe', 'Association deconseillee'), 4: ('Severe', 'Contre-indication')}
+SYLLABLES = ['al', 'am', 'an', 'ar', 'ba', 'ce', 'ci', 'da', 'di', 'do', 'fe', 'fu', 'ga', 'la', 'le',
+             'lo', 'ma', 'me', 'mi', 'na', 'ne', 'no', 'pa', 'pi', 'pro', 'ra', 're', 'ri', 'sa',
+             'se', 'ta', 'te', 'ti', 'to', 'va', 'ver', 'xi', 'zo']
+SUFFIXES = ['pril', 'sartan', 'olol', 'statin', 'dipine', 'prazole', 'mab', 'cillin', 'mycin',
+            'floxacin', 'azole', 'tidine', 'triptan', 'parin', 'semide', 'formin', 'gliptin', 'one']
+# Parameters that carry a single value; all others are lists
+SCALAR_PARAMS = {'patient_id', 'hadm_id', 'drug_name', 'replaced_drug', 'replacement_drug', 'side_effect'}
+
+
+def _unit(*parts):
+    """ Stable pseudo-random number in [0, 1) for the given key """
+    return zlib.crc32("|".join(map(str, parts)).encode()) / 2 ** 32
+
+
+def _rng(*parts):
+    return random.Random(zlib.crc32("|".join(map(str, parts)).encode()))
+
+
+def _names(rng, count, make):
+    names = set()
+    while len(names) < count:
+        names.add(make(rng))
+    return sorted(names)
+
+
+class SyntheticData:
+    """ Deterministic synthetic responses for every API endpoint """
+
+    def __init__(self, drugs=3000, events=5000, hlts=1200, indications=400, classes=120,
+                 interaction_rate=0.05, side_effects_per_drug=80, max_alternatives=50, seed=0):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.interaction_rate = interaction_rate
+        self.side_effects_per_drug = side_effects_per_drug
+        self.max_alternatives = max_alternatives
+
+        self.drug_names = _names(rng, drugs, lambda r: "".join(r.choices(SYLLABLES, k=r.randint(1, 3))) + r.choice(SUFFIXES))
+        self.events = _names(rng, events, lambda r: " ".join(
+            "".join(r.choices(SYLLABLES, k=r.randint(2, 4))) for _ in range(r.randint(1, 2))).capitalize())
+        self.hlts = [f"{event} disorders" for event in rng.sample(self.events, min(hlts, len(self.events)))]
+        self.indication_names = rng.sample(self.events, min(indications, len(self.events)))
+        self.class_titles = [f"{name.capitalize()} agents" for name in rng.sample(self.drug_names, min(classes, len(self.drug_names)))]
+
+        self.barkla_drug_names = sorted(rng.sample(self.drug_names, int(len(self.drug_names) * 0.7)))
+        self.barkla_side_effects_names = sorted(rng.sample(self.events, min(1000, len(self.events))))
+        self.faers_drug_names = sorted(rng.sample(self.drug_names, int(len(self.drug_names) * 0.8)))
+
+        self._known_drugs = set(self.drug_names)
+
+        # Inverse index used by alternative_search
+        self._drugs_by_indication = defaultdict(list)
+        for drug in self.drug_names:
+            for indication in self._indications(drug):
+                self._drugs_by_indication[indication].append(drug)
+
+    # Per-drug and per-pair facts ------------------------------------------------
+    def _indications(self, drug):
+        rng = _rng(self.seed, 'indications', drug)
+        return rng.sample(self.indication_names, rng.randint(1, 6))
+
+    def _side_effects(self, drug):
+        rng = _rng(self.seed, 'side_effects', drug)
+        count = max(1, int(self.side_effects_per_drug * rng.uniform(0.5, 1.5)))
+        return [(event, rng.choice(FREQUENCIES)) for event in rng.sample(self.events, min(count, len(self.events)))]
+
+    def _pair_interactions(self, drug_a, drug_b):
+        drug_a, drug_b = sorted((drug_a, drug_b))
+        if drug_a not in self._known_drugs and drug_b not in self._known_drugs:
+            return []  # Lifestyle factors and vaccines only interact with drugs
+        if _unit(self.seed, 'pair', drug_a, drug_b) >= self.interaction_rate:
+            return []
+        rng = _rng(self.seed, 'interactions', drug_a, drug_b)
+        rows = []
+        for event in rng.sample(self.events, rng.randint(1, 2)):
+            severity = rng.randint(1, 4)
+            severity_bnf, severity_ansm = SEVERITIES[severity]
+            rows.append({
+                'drug_a_concept_name': drug_a,
+                'drug_b_concept_name': drug_b,
+                'event_concept_name': event,
+                'severity_bnf': severity_bnf,
+                'severity_ansm': severity_ansm if rng.random() < 0.6 else None,
+                'severity_code': severity,
+                'evidence': rng.choice(['Study', 'Theoretical', 'Anecdotal']),
+                'description': f"{drug_a.capitalize()} may increase the risk of {event.lower()} when given with {drug_b}.",
+            })
+        return rows
+
+    def _hlt(self, event):
+        return self.hlts[int(_unit(self.seed, 'hlt', event) * len(self.hlts))]
+
+    def _drug_class(self, drug):
+        if _unit(self.seed, 'has_class', drug) >= 0.8:
+            return None
+        return self.class_titles[int(_unit(self.seed, 'class', drug) * len(self.class_titles))]
+
+    def _rate(self, drug, event):
+        return round(_unit(self.seed, 'rate', drug, event) * 10, 4)
+
+    # Endpoints ----------------------------------------------------------------
+    def interactions(self, drug_list=(), **_):
+        drugs = list(dict.fromkeys(drug_list))
+        return [row for i, drug_a in enumerate(drugs) for drug_b in drugs[i + 1:]
+                for row in self._pair_interactions(drug_a, drug_b)]
+
+    def side_effects(self, drug_list=(), **_):
+        return [{'drug_concept_name': drug, 'event_concept_name': event, 'frequency': frequency,
+                 'source': 'BNF' if _unit(self.seed, 'source', drug, event) < 0.7 else 'SIDER'}
+                for drug in dict.fromkeys(drug_list) for event, frequency in self._side_effects(drug)]
+
+    def ancestor_side_effects(self, pt_list=(), **_):
+        return {event: self._hlt(event) for event in pt_list}
+
+    def indications(self, drug_list=(), **_):
+        return {drug: self.single_drug_indications(drug_name=drug) for drug in dict.fromkeys(drug_list)}
+
+    def single_drug_indications(self, drug_name=None, **_):
+        return [{'drug_concept_name': drug_name, 'event_concept_name': indication}
+                for indication in self._indications(drug_name)]
+
+    def alternative_search(self, replaced_drug=None, indication_list=(), **_):
+        alternatives = {}
+        for indication in indication_list:
+            for drug in self._drugs_by_indication.get(indication, ()):
+                if drug != replaced_drug:
+                    alternatives.setdefault(drug, indication)
+        return [{'drug_concept_name': drug, 'event_concept_name': indication}
+                for drug, indication in list(alternatives.items())[:self.max_alternatives]]
+
+    def alternative_interactions(self, replaced_drug=None, replacement_drug=None, drug_list=(), **_):
+        return [row for drug in dict.fromkeys(drug_list) if drug not in (replaced_drug, replacement_drug)
+                for row in self._pair_interactions(replacement_drug, drug)]
+
+    def drug_classes(self, drug_list=(), **_):
+        return [{'drug_name': drug, 'title': title} for drug in dict.fromkeys(drug_list)
+                if (title := self._drug_class(drug)) is not None]
+
+    def patient_portfolio_mimic(self, patient_id=None, **_):
+        rng = _rng(self.seed, 'patient', patient_id)
+        prescriptions = []
+        for drug in rng.sample(self.drug_names, rng.randint(10, 40)):
+            start = f"21{rng.randint(10, 99)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            prescriptions.append({
+                'drug': drug.capitalize() if rng.random() < 0.5 else f"{drug.capitalize()} {rng.choice([5, 10, 20, 500])}mg",
+                'drug_name_generic': drug if rng.random() < 0.5 else '',
+                'dose_val_rx': str(rng.choice([1, 2, 5, 10, 20, 40, 500])),
+                'dose_unit_rx': rng.choice(['mg', 'mcg', 'mL', 'UNIT']),
+                'route': rng.choice(['PO', 'IV', 'SC', 'PR']),
+                'start_date': f"{start} 00:00:00",
+                'end_date': f"{start} 00:00:00",
+            })
+        return {
+            'patient_id': int(patient_id),
+            'patient_gender': rng.choice(['M', 'F']),
+            'patient_age': -rng.randint(18, 90) if rng.random() < 0.1 else rng.randint(18, 90),
+            'patient_dob': f"20{rng.randint(10, 80)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00",
+            'prescriptions': prescriptions,
+        }
+
+    def patient_diagnoses_mimic(self, patient_id=None, **_):
+        rng = _rng(self.seed, 'diagnoses', patient_id)
+        admissions = [100000 + int(_unit(self.seed, 'hadm', patient_id, i) * 99999) for i in range(rng.randint(1, 15))]
+        return [{
+            'icd9_code': f"{rng.randint(1, 999):03d}{rng.randint(0, 9)}",
+            'short_title': event[:24],
+            'long_title': f"{event}, unspecified",
+            'hadm_ids': rng.sample(admissions, rng.randint(1, len(admissions))),
+        } for event in rng.sample(self.events, rng.randint(5, 30))]
+
+    def admission_details(self, hadm_id=None, **_):
+        rng = _rng(self.seed, 'admission', hadm_id)
+        month, day = rng.randint(1, 12), rng.randint(1, 20)
+        return {'hadm_id': int(hadm_id),
+                'admission_time': f"2150-{month:02d}-{day:02d} 08:00:00",
+                'discharge_time': f"2150-{month:02d}-{day + rng.randint(1, 8):02d} 12:00:00"}
+
+    def culprit_drug(self, side_effect=None, drug_list=(), **_):
+        rows = [{'drug_name': drug, 'combined_rate': self._rate(drug, side_effect),
+                 'score': round(_unit(self.seed, 'score', drug, side_effect), 4)} for drug in dict.fromkeys(drug_list)]
+        return sorted(rows, key=lambda row: row['combined_rate'], reverse=True)
+
+    def most_likely_side_effects(self, drug_list=(), **_):
+        totals, top_drug = Counter(), {}
+        for drug in dict.fromkeys(drug_list):
+            for event, _ in self._side_effects(drug):
+                rate = self._rate(drug, event)
+                totals[event] += rate
+                if rate > top_drug.get(event, (None, -1))[1]:
+                    top_drug[event] = (drug, rate)
+        return [{'side_effect': event, 'total_rate': total, 'most_likely_drug': top_drug[event][0]}
+                for event, total in totals.most_common(10)]
+
+    def most_likely_side_effects_faers(self, drug_list=(), **_):
+        rows = []
+        for drug in dict.fromkeys(drug_list):
+            cases = 100 + int(_unit(self.seed, 'cases', drug) * 50000)
+            for event, _ in self._side_effects(drug)[:5]:
+                count = max(1, int(cases * _unit(self.seed, 'faers', drug, event) * 0.1))
+                rate = count / cases
+                wilson = 1.96 * math.sqrt(rate * (1 - rate) / cases)
+                rows.append({'drug_name': drug, 'side_effect': event, 'drug_side_effect_occurrence_count': count,
+                             'case_count_with_drug': cases, 'rate': rate, 'wilson_interval': wilson})
+        return rows
+
+    def respond(self, endpoint, params):
+        """ Response body for an endpoint, or None if the endpoint does not exist """
+        if endpoint in ('drug_names', 'barkla_drug_names', 'barkla_side_effects_names', 'faers_drug_names'):
+            return getattr(self, endpoint)
+        handler = getattr(self, endpoint, None)
+        if endpoint.startswith('_') or endpoint == 'respond' or not callable(handler):
+            return None
+        return handler(**params)
+
+
+class MockAPIServer(ThreadingHTTPServer):
+    """ Threaded HTTP server for SyntheticData, with request counters and fixture record/replay """
+
+    daemon_threads = True
+
+    def __init__(self, address, data, latency_ms=0.0, latency_jitter_ms=0.0, endpoint_latency_ms=None,
+                 record=None, replay=None):
+        super().__init__(address, _Handler)
+        self.data = data
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.endpoint_latency_ms = endpoint_latency_ms or {}
+        self._lock = threading.Lock()
+        self._record = open(record, "a") if record else None
+        self._fixtures = {}
+        if replay:
+            with open(replay) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._fixtures[(entry['endpoint'], entry['params'])] = entry['body']
+        self.reset_stats()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = Counter()
+            self.bytes_sent = Counter()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': dict(self.requests), 'bytes': dict(self.bytes_sent),
+                    'total_requests': sum(self.requests.values()), 'total_bytes': sum(self.bytes_sent.values())}
+
+    def body_for(self, endpoint, params):
+        key = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        body = self._fixtures.get((endpoint, key))
+        if body is None:
+            response = self.data.respond(endpoint, params)
+            if response is None:
+                return None
+            body = json.dumps(response)
+            if self._record:
+                with self._lock:
+                    self._record.write(json.dumps({'endpoint': endpoint, 'params': key, 'body': body}) + "\n")
+                    self._record.flush()
+        return body.encode()
+
+    def delay(self, endpoint):
+        latency = self.endpoint_latency_ms.get(endpoint, self.latency_ms)
+        if self.latency_jitter_ms:
+            latency += random.uniform(0, self.latency_jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def count(self, endpoint, size):
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.bytes_sent[endpoint] += size
+
+    def server_close(self):
+        super().server_close()
+        if self._record:
+            self._record.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Allow keep-alive
+    disable_nagle_algorithm = True
+    max_request_line = 1 << 20  # ancestor_side_effects sends every PT of a large portfolio in the query
+
+    def handle_one_request(self):
+        # Same as BaseHTTPRequestHandler.handle_one_request, without its 64 KiB request line limit
+        try:
+            self.raw_requestline = self.rfile.readline(self.max_request_line + 1)
+            if len(self.raw_requestline) > self.max_request_line:
+                self.requestline = self.request_version = self.command = ''
+                self.send_error(414)
+                return
+            if not self.raw_requestline:
+                self.close_connection = True
+                return
+            if not self.parse_request():
+                return
+            method = getattr(self, 'do_' + self.command, None)
+            if method is None:
+                self.send_error(501, f"Unsupported method ({self.command!r})")
+                return
+            method()
+            self.wfile.flush()
+        except TimeoutError:
+            self.close_connection = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] if key in SCALAR_PARAMS else values
+                  for key, values in parse_qs(url.query).items()}
+        self._respond(url.path.strip("/"), params)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = json.loads(self.rfile.read(length) or b"{}") or {}
+        self._respond(urlsplit(self.path).path.strip("/"), params)
+
+    def _respond(self, endpoint, params):
+        server = self.server
+        if endpoint == "_stats":
+            body, status = json.dumps(server.stats()).encode(), 200
+        else:
+            server.delay(endpoint)
+            body = server.body_for(endpoint, params)
+            status = 200 if body is not None else 404
+            body = body if body is not None else b'{"detail": "Not Found"}'
+            server.count(endpoint, len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_mock_api(data=None, host="127.0.0.1", port=0, **kwargs):
+    """ Start a MockAPIServer on a background thread and return it; call shutdown() when done """
+    server = MockAPIServer((host, port), data or SyntheticData(), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--drugs", type=int, default=3000)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--interaction-rate", type=float, default=0.05)
+    parser.add_argument("--side-effects-per-drug", type=int, default=80)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0, help="Extra uniform random delay")
+    parser.add_argument("--endpoint-latency-ms", default="{}", help='JSON overrides, e.g. \'{"interactions": 400}\'')
+    parser.add_argument("--record", help="Append every generated response to this JSON lines file")
+    parser.add_argument("--replay", help="Serve responses from a file written by --record")
+    args = parser.parse_args()
+
+    data = SyntheticData(drugs=args.drugs, events=args.events, interaction_rate=args.interaction_rate,
+                         side_effects_per_drug=args.side_effects_per_drug, seed=args.seed)
+    server = MockAPIServer((args.host, args.port), data, latency_ms=args.latency_ms,
+                           latency_jitter_ms=args.latency_jitter_ms,
+                           endpoint_latency_ms=json.loads(args.endpoint_latency_ms),
+                           record=args.record, replay=args.replay)
+    print(f"Serving {len(data.drug_names)} synthetic drugs on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+""" Typed side effect frames join onto interactions when a column has no values at all.
+
+Runs on its own in a second, with pytest or directly:
+
+    python -m pytest benchmarks/test_join_side_effects.py
+"""
+import pandas as pd
+import pytest
+
+from _common import use_app_modules
+
+use_app_modules()
+from utils import join_interactions_and_side_effects, load_interactions, load_side_effects  # noqa: E402
+
+INTERACTIONS = [
+    {'drug_a_concept_name': 'aspirin', 'drug_b_concept_name': 'warfarin', 'event_concept_name': 'Haemorrhage',
+     'severity_bnf': 'Severe', 'severity_ansm': None, 'severity_code': 4, 'evidence': 'Study',
+     'description': 'Aspirin may increase the risk of haemorrhage when given with warfarin.'},
+]
+
+SIDE_EFFECTS = [
+    {'drug_concept_name': 'aspirin', 'event_concept_name': 'Nausea', 'frequency': 'Common', 'source': 'BNF'},
+    {'drug_concept_name': 'warfarin', 'event_concept_name': 'Haemorrhage', 'frequency': 'Very common',
+     'source': 'SIDER'},
+]
+
+
+def _without(rows, column):
+    return [{**row, column: None} for row in rows]
+
+
+@pytest.mark.parametrize("ancestors", [{}, None])
+@pytest.mark.parametrize("missing", [None, 'frequency', 'source'])
+def test_all_missing_columns(ancestors, missing):
+    side_effects = SIDE_EFFECTS if missing is None else _without(SIDE_EFFECTS, missing)
+    joined = join_interactions_and_side_effects(load_interactions(INTERACTIONS),
+                                                load_side_effects(side_effects, ancestors))
+
+    assert len(joined) == len(INTERACTIONS) + len(side_effects)
+    assert joined['ancestor'].isna().all()
+    for column in ['drug_concept_name', 'event_concept_name', 'frequency', 'source', 'ancestor']:
+        assert isinstance(joined[column].dtype, pd.CategoricalDtype)
+        assert joined[column].cat.categories.dtype == object
+    assert joined['frequency'].tolist()[:len(INTERACTIONS)] == ['Not reported (Interaction Effect)']
+    assert joined['source'].tolist()[:len(INTERACTIONS)] == ['interaction']
+    if missing is not None:
+        assert joined[missing].iloc[len(INTERACTIONS):].isna().all()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,72 @@
+""" partition_side_effects gives the same three frames as the baseline split-and-apply lambdas.
+
+Runs on its own in a second, with pytest or directly:
+
+    python -m pytest benchmarks/test_partition_side_effects.py
+"""
+import pandas as pd
+import pytest
+
+from _common import use_app_modules
+from _frames import side_effect_frame
+from bench_partition_side_effects import legacy_partition, with_factor_and_vaccine_names
+
+use_app_modules()
+from constants import LIFESTYLE_FACTORS, vaccine_list  # noqa: E402
+from utils import partition_side_effects  # noqa: E402
+
+DRUG_NAMES = [
+    'aspirin',
+    'aspirin + grapefruit',
+    'Grapefruit + aspirin',
+    'aspirin + GRAPEFRUIT',
+    ' grapefruit ',
+    'aspirin  grapefruit',  # Two spaces, which the baseline split on
+    'grapefruit  + aspirin',
+    'b  c + aspirin',
+    'b c + aspirin',
+    'Alcoholic beverage + warfarin',
+    'BCG Vaccine + aspirin',
+    'bcg vaccine + Alcoholic beverage',  # Both a factor and a vaccine
+    'aspirin + peppermint oil',
+    'cranberryjuice',
+]
+
+FACTOR_LISTS = [
+    LIFESTYLE_FACTORS,
+    [],
+    LIFESTYLE_FACTORS[:1],
+    [' Grapefruit '],
+    ['GRAPEFRUIT', 'Peppermint'],
+    ['b  c'],  # Never matches: the baseline split the names on runs of spaces first
+    ['grapefruit  '],
+    [''],  # Matches every name
+]
+
+
+def _frame(names, categorical=False):
+    df = pd.DataFrame({'drug_concept_name': names, 'event_concept_name': [f"event {i}" for i in range(len(names))]})
+    if categorical:
+        df['drug_concept_name'] = df['drug_concept_name'].astype('category')
+    return df
+
+
+def _assert_same(df, factors):
+    for before, after in zip(legacy_partition(df, factors, vaccine_list), partition_side_effects(df, factors, vaccine_list)):
+        pd.testing.assert_frame_equal(after, before)
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+@pytest.mark.parametrize("factors", FACTOR_LISTS)
+def test_edge_case_names(factors, categorical):
+    _assert_same(_frame(DRUG_NAMES, categorical), factors)
+
+
+@pytest.mark.parametrize("factors", FACTOR_LISTS)
+def test_synthetic_names(factors):
+    df = with_factor_and_vaccine_names(side_effect_frame(events=200, drugs=20), LIFESTYLE_FACTORS, vaccine_list)
+    _assert_same(df, factors)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -1,22 +1,31 @@
 import streamlit as st
 import pandas as pd
+from streamlit.logger import get_logger
 from itertools import combinations  # Add this import at the top of the file
-import easyocr
-import numpy as np
-import cv2
 
-from utils import api_call, join_interactions_and_side_effects
-from constants import DDI_COLUMNS, SIDE_EFFECT_COLUMNS, LIFESTYLE_FACTORS, vaccine_list, patient_ids_temp
+from utils import api_call, fetch_admission_details
+from search_results import search_portfolio
+from drug_name_index import get_drug_name_index
+from ocr import image_digest, scan_prescription, warm_up_ocr_reader
+from constants import LIFESTYLE_FACTORS, OCR_WARM_UP, vaccine_list, patient_ids_temp
 from components.side_effects_tab.display_side_effects import display_side_effects_table, display_key, display_vaccine_interactions
 from components.interactions_tab.interactions_list import interactions_list
 
+LOGGER = get_logger(__name__)
+
 # Data --------------------------------------------------------------------------
 # Fetch the set of drug names for the search box
 drug_names = api_call("drug_names")
+# Exact and fuzzy lookup of those names in OCR text and patient prescriptions
+drug_name_index = get_drug_name_index(drug_names)
 
 # Layout ------------------------------------------------------------------------
 st.set_page_config(layout="wide", page_title="Drug Interaction and Side Effects Tool")
 
+if OCR_WARM_UP:
+    # Only the first run in this process loads the models; later runs hit the resource cache
+    warm_up_ocr_reader()
+
 st.markdown("""
 <style>
     .main .block-container {
@@ -97,16 +106,8 @@ with col_patient:
                     # First try to get diagnoses data without showing error
                     diagnoses_data = api_call("patient_diagnoses_mimic", params={"patient_id": patient_id}, show_error=False)
                     
-                    # Fetch admission details for each diagnosis
-                    admission_details = {}
-                    if diagnoses_data:  # Only process if diagnoses_data is not None
-                        for diagnosis in diagnoses_data:
-                            for hadm_id in diagnosis['hadm_ids']:
-                                if hadm_id not in admission_details:
-                                    # Get admission details for this hadm_id
-                                    admission_info = api_call("admission_details", params={"hadm_id": hadm_id})
-                                    if admission_info:
-                                        admission_details[hadm_id] = admission_info
+                    # Fetch admission details for every distinct admission concurrently
+                    admission_details = fetch_admission_details(diagnoses_data)
                     
                     # Store data in session state
                     st.session_state.patient_data = patient_data
@@ -151,8 +152,10 @@ with col_patient:
                             if generic_name:
                                 unique_drugs.add(generic_name.lower())
                         
-                        # Find matching drugs in our drug_names list
-                        matching_drugs = [drug for drug in unique_drugs if drug in drug_names]
+                        # Find matching drugs in our drug_names list, ignoring doses but never guessing at near misses
+                        matching_drugs = list(dict.fromkeys(
+                            name for name in map(drug_name_index.match_record, sorted(unique_drugs)) if name is not None
+                        ))
                         
                         if matching_drugs:
                             st.write(f"**Found {len(matching_drugs)} medications in patient records**")
@@ -236,38 +239,25 @@ with col_upload:
         if prescription_image is not None:
             st.session_state.image_collapsed = False
             
+            # Identify the image by its content so renamed copies match and same-named photos do not
+            image_bytes = prescription_image.getvalue()
+            image_hash = image_digest(image_bytes)
+
             # Only reset selections if a new image is uploaded
-            if 'last_image_name' not in st.session_state or st.session_state.last_image_name != prescription_image.name:
+            if 'last_image_hash' not in st.session_state or st.session_state.last_image_hash != image_hash:
                 st.session_state.search_box = []
                 if 'drug_multiselect' in st.session_state:
                     st.session_state.drug_multiselect = []
-                st.session_state.last_image_name = prescription_image.name
+                st.session_state.last_image_hash = image_hash
             
             # Process OCR only if we haven't processed this image before
-            if 'processed_image_name' not in st.session_state or st.session_state.processed_image_name != prescription_image.name:
-                detected_drugs = []
-                image_bytes = prescription_image.read()
-                reader = easyocr.Reader(['en'])
-                results = reader.readtext(image_bytes)
-                
-                # Convert image bytes to numpy array for display
-                nparr = np.frombuffer(image_bytes, np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                
-                # Draw bounding boxes and store processed image
-                for detection in results:
-                    text = detection[1].lower()
-                    if text in drug_names:
-                        detected_drugs.append(text)
-                        bbox = np.array(detection[0], dtype=np.int32).reshape((-1, 1, 2))
-                        cv2.polylines(img, [bbox], True, (255, 0, 0), 3)
-                        cv2.putText(img, text, (bbox[0][0][0], bbox[0][0][1] - 10), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+            if 'processed_image_hash' not in st.session_state or st.session_state.processed_image_hash != image_hash:
+                # Served from the shared OCR cache when any session has scanned this photo before
+                detected_drugs, img = scan_prescription(image_bytes, drug_name_index)
                 
                 # Store the processed image in session state
                 st.session_state.processed_img = img
-                st.session_state.processed_image_name = prescription_image.name
+                st.session_state.processed_image_hash = image_hash
                 
                 if detected_drugs:
                     st.write(f"""Identified **{len(set(detected_drugs))}** drug names from the image.""")
@@ -323,80 +313,38 @@ else:
 if st.session_state.has_searched and selected_drugs:
     # Get interactions
     tab_interactions, tab_side_effects = st.tabs(["Interactions", "All Side Effects"])
-    interactions = api_call("interactions", params={"drug_list": [*selected_drugs, *selected_factors, *vaccine_list]})
-    if interactions:
-        interactions_df = pd.DataFrame(interactions)[DDI_COLUMNS]  # Only select the columns we want
 
-        # Corrected filtering for lifestyle interactions
-        lifestyle_interactions = interactions_df[
-            interactions_df['drug_a_concept_name'].isin(selected_factors) | 
-            interactions_df['drug_b_concept_name'].isin(selected_factors)
-        ]
-        # Corrected filtering for vaccine interactions
-        vaccine_interactions = interactions_df[
-            interactions_df['drug_a_concept_name'].isin(vaccine_list) | 
-            interactions_df['drug_b_concept_name'].isin(vaccine_list)
-        ]
-        all_other_interactions = interactions_df.drop(lifestyle_interactions.index).drop(vaccine_interactions.index)
+    # Fetched and processed once per portfolio, then shared by every session searching it
+    search_results, search_timings = search_portfolio(selected_drugs, selected_factors, vaccine_list)
+    if search_timings:
+        # Only searches that were fetched rather than served from the search cache have timings
+        LOGGER.info("Searched %d drugs; stage timings: %s", len(selected_drugs),
+                    ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in search_timings.items()))
+    interactions_df = search_results['interactions']
+    drug_indications = search_results['indications']
+    if interactions_df is not None:
+        sections = search_results['interaction_sections']
         
         with tab_interactions:
 
             st.write(f"**Found {len(interactions_df)} interactions.**")
            
-            # st.markdown(f"#### Interactions due to selected drugs ({len(all_other_interactions)})")
-            with st.expander(f"**Interactions due to selected drugs ({len(all_other_interactions)})**", expanded=False):
-                if not all_other_interactions.empty:
-                    interactions_list(selected_drugs, all_other_interactions)
-                else:
-                    st.info("No interactions found.")
-
-            # st.divider()
-            # st.markdown(f"#### Interactions due to lifestyle factors ({len(lifestyle_interactions)})")
-            with st.expander(f"**Interactions due to lifestyle factors ({len(lifestyle_interactions)})**", expanded=False):
-                if not lifestyle_interactions.empty:
-                    interactions_list(selected_drugs, lifestyle_interactions)
-                else:
-                    st.info("No interactions found.")
-
-            # st.divider()
-            # st.markdown(f"#### Interactions due to vaccines ({len(vaccine_interactions)})")
-            with st.expander(f"**Interactions due to vaccines ({len(vaccine_interactions)})**", expanded=False):
-                if not vaccine_interactions.empty:
-                    interactions_list(selected_drugs, vaccine_interactions)
-                else:
-                    st.info("No interactions found.")
-
-
+            # Cards are only built for the sections that are switched on
+            interactions_list(selected_drugs, sections['drugs'], drug_indications,
+                              title="Interactions due to selected drugs", key="drugs")
+            interactions_list(selected_drugs, sections['lifestyle'], drug_indications,
+                              title="Interactions due to lifestyle factors", key="lifestyle")
+            interactions_list(selected_drugs, sections['vaccines'], drug_indications,
+                              title="Interactions due to vaccines", key="vaccines")
 
     else:
         with tab_interactions:
             st.warning("No interactions found for selected drugs.")
     
     # Get side effects
-    side_effects = api_call("side_effects", params={"drug_list": [*selected_drugs, *selected_factors]})
-    if side_effects:
-        side_effects_df = pd.DataFrame(side_effects)[SIDE_EFFECT_COLUMNS]  # Only select the columns we want
-        hlt_side_effects = api_call("ancestor_side_effects", params={"pt_list": side_effects_df['event_concept_name'].tolist()})
-        side_effects_df["ancestor"] = side_effects_df["event_concept_name"].map(hlt_side_effects)
-
-        if interactions:
-            # Join interactions and side effects - show the full picture
-            side_effects_df = join_interactions_and_side_effects(interactions_df, side_effects_df)        
-        
-        lifestyle_side_effects_df = side_effects_df[
-            side_effects_df['drug_concept_name'].str.split(' + ').apply(
-                lambda x: any(factor.strip().lower() in y.strip().lower() for factor in selected_factors for y in x)
-            )
-        ]
-
-        vaccine_side_effects_df = side_effects_df[
-            side_effects_df['drug_concept_name'].str.split(' + ').apply(
-                lambda x: any(factor.strip().lower() in y.strip().lower() for factor in vaccine_list for y in x)
-            )
-        ]
-        
-
-        drug_side_effects_df = side_effects_df.drop([*lifestyle_side_effects_df.index, *vaccine_side_effects_df.index])
+    if search_results['side_effect_sections']:
+        drug_side_effects_df, lifestyle_side_effects_df, vaccine_side_effects_df = search_results['side_effect_sections'].values()
+        tables = search_results['side_effect_tables']
 
         with tab_side_effects:
             display_key()
@@ -405,7 +353,7 @@ if st.session_state.has_searched and selected_drugs:
             drug_effects_expander = st.expander("**Due to selected drugs**", expanded=True)
             with drug_effects_expander:
                 if len(drug_side_effects_df) > 0:
-                    display_side_effects_table(drug_side_effects_df, key_suffix="drugs")
+                    display_side_effects_table(drug_side_effects_df, key_suffix="drugs", tables=tables.get('drugs'))
                 else:
                     st.info("No adverse effects due to selected drugs found.")
             
@@ -413,7 +361,8 @@ if st.session_state.has_searched and selected_drugs:
             lifestyle_expander = st.expander("**Due to lifestyle factor interactions**", expanded=True)
             with lifestyle_expander:
                 if len(lifestyle_side_effects_df) > 0:
-                    display_side_effects_table(lifestyle_side_effects_df, hlt=False, key_suffix="lifestyle")
+                    display_side_effects_table(lifestyle_side_effects_df, hlt=False, key_suffix="lifestyle",
+                                               tables=tables.get('lifestyle'))
                 else:
                     st.info("No adverse effects due to drug interactions with lifestyle factors found.")
             
@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
-from utils import api_call
+from utils import api_call, api_call_many, api_lookup
 from constants import severity_colour_map, NAME_EVENT_COLUMNS, LIFESTYLE_FACTORS
 
+@st.fragment
 def alternative_search(selected_drugs, drug_indications_df, drug, index):
-    """ Generate alternative drug search interface """
+    """ Generate alternative drug search interface, rerun on its own when its widgets change """
     # Initialize session state for this specific drug's alternatives
     state_key = f"alternatives_{drug}_{index}"
     if state_key not in st.session_state:
@@ -23,20 +23,15 @@ def alternative_search(selected_drugs, drug_indications_df, drug, index):
                                           params={"replaced_drug": drug,
                                                   "indication_list": selected_indications})
                 if drug_alternatives:
-                    for item in drug_alternatives:
-                        replacement_drug_interactions = api_call("alternative_interactions", 
-                                                            params={
-                                                                "replaced_drug": drug,
-                                                                "replacement_drug": item["drug_concept_name"],
-                                                                "drug_list": selected_drugs
-                                                            })
-                        item['interactions'] = replacement_drug_interactions
-                        item['max_severity'] = max([int(i["severity_code"]) for i in replacement_drug_interactions]) if replacement_drug_interactions else 0
+                    score_alternatives(drug, drug_alternatives, selected_drugs)
                     drug_alternatives = sorted(drug_alternatives, key=lambda x: x['max_severity'])
+                    # Get drug classes for the original and alternative drugs
+                    drug_classes = drug_class_titles([drug, *[item["drug_concept_name"] for item in drug_alternatives]])
                     # Store results in session state
                     st.session_state[state_key] = {
                         'alternatives': drug_alternatives,
-                        'indications': selected_indications
+                        'indications': selected_indications,
+                        'drug_classes': drug_classes
                     }
                 else:
                     st.warning("No alternatives found for selected indications.")
@@ -45,26 +40,55 @@ def alternative_search(selected_drugs, drug_indications_df, drug, index):
         
         # Display results if they exist and indications match
         if st.session_state[state_key] and set(selected_indications) == set(st.session_state[state_key]['indications']):
-            # Get drug class for the alternative drug
-            drug_classes = api_call("drug_classes", params={"drug_list": [item["drug_concept_name"] for item in st.session_state[state_key]['alternatives']]})
-            original_drug_class = api_call("drug_classes", params={"drug_list": [drug]})
             # alternative_results(drug, index, st.session_state[state_key]['alternatives'])
-            alternative_results_with_drug_classes(drug, index, st.session_state[state_key]['alternatives'], drug_classes, original_drug_class)
+            alternative_results_with_drug_classes(drug, index, st.session_state[state_key]['alternatives'], st.session_state[state_key]['drug_classes'])
     else:
         if drug not in LIFESTYLE_FACTORS:
             st.info(f"Alternative search not available for {drug}: no indications found.")
 
-def alternative_results_with_drug_classes(drug, index, dict, drug_classes, original_drug_class):
+def score_alternatives(drug, drug_alternatives, selected_drugs):
+    """ Add the interactions and maximum severity of each replacement against the selected drugs """
+    # The API scores one replacement per request, so score all candidates concurrently
+    all_interactions = api_call_many("alternative_interactions", [
+        {"replaced_drug": drug, "replacement_drug": item["drug_concept_name"], "drug_list": selected_drugs}
+        for item in drug_alternatives
+    ])
+    for item, replacement_drug_interactions in zip(drug_alternatives, all_interactions):
+        item['interactions'] = replacement_drug_interactions
+        item['max_severity'] = max([int(i["severity_code"]) for i in replacement_drug_interactions]) if replacement_drug_interactions else 0
+
+def drug_class_titles(drug_names):
+    """ Drug class title of each drug, None for drugs without a class """
+    def fetch(missing):
+        drug_classes = api_call("drug_classes", params={"drug_list": missing}, cache=False)
+        if drug_classes is None:
+            return None
+        titles = {item['drug_name'].lower(): item['title'] for item in drug_classes}
+        return {name: titles.get(name.lower()) for name in missing}
+
+    return api_lookup("drug_classes", drug_names, fetch)
+
+def drug_indication_names(drug_names):
+    """ Indication names of each drug, from one bulk request for the drugs not cached yet """
+    def fetch(missing):
+        all_indications = api_call("indications", params={"drug_list": missing}, cache=False)
+        if all_indications is None:
+            return None
+        return {name: [i['event_concept_name'] for i in all_indications.get(name) or []] for name in missing}
+
+    return api_lookup("indications", drug_names, fetch)
+
+def alternative_results_with_drug_classes(drug, index, dict, drug_classes):
     """ Generate alternative drug search results with drug classes """
+    # Prefetch the indications shown in every alternative's tooltip
+    indications = drug_indication_names([item['drug_concept_name'] for item in dict])
+
     # Group alternative drugs by drug class
     drug_classes_dict = {}
     unknown_class_drugs = []  # New list for drugs without a class
     
     # Create case-insensitive drug class lookup
-    if drug_classes:
-        drug_classes_lower = {item['drug_name'].lower(): item['title'] for item in drug_classes}
-    else:
-        drug_classes_lower = {}
+    drug_classes_lower = {name.lower(): title for name, title in drug_classes.items() if title}
     
     for item in dict:
         drug_name = item['drug_concept_name'].lower()
@@ -77,7 +101,7 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
             unknown_class_drugs.append(item)
 
     # Get the original drug's class title
-    original_class_title = original_drug_class[0]['title'] if original_drug_class else None
+    original_class_title = drug_classes.get(drug)
 
     # First create a container with border
     with st.container(border=True):
@@ -93,7 +117,7 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
                 if original_class_title and original_class_title in drug_classes_dict:
                     same_class_no_interactions = [item for item in drug_classes_dict[original_class_title] if not item['interactions']]
                     if same_class_no_interactions:
-                        display_alternatives_grid(same_class_no_interactions, drug_classes_lower)
+                        display_alternatives_grid(same_class_no_interactions, drug_classes_lower, indications)
             if not same_class_no_interactions and original_class_title:
                 st.write("None found")
 
@@ -108,7 +132,7 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
                         if not other_classes_no_interactions:
                             other_classes_no_interactions = True
                         st.markdown(f"**{drug_class}**")
-                        display_alternatives_grid(items_no_interactions, drug_classes_lower)
+                        display_alternatives_grid(items_no_interactions, drug_classes_lower, indications)
             
             # Show drugs without a class
             unknown_class_no_interactions = [item for item in unknown_class_drugs if not item['interactions']]
@@ -117,7 +141,7 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
                     other_classes_no_interactions = True
                 if original_class_title:
                     st.markdown("**Other drugs, classification not available**")
-                display_alternatives_grid(unknown_class_no_interactions, drug_classes_lower)
+                display_alternatives_grid(unknown_class_no_interactions, drug_classes_lower, indications)
 
             if not other_classes_no_interactions and not unknown_class_no_interactions and original_class_title:
                 st.write("None found")
@@ -134,7 +158,7 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
                     if same_class_with_interactions:
                         # Sort by max severity
                         same_class_with_interactions.sort(key=lambda x: x['max_severity'])
-                        display_alternatives_with_interactions(same_class_with_interactions, drug_classes_lower)
+                        display_alternatives_with_interactions(same_class_with_interactions, drug_classes_lower, indications)
             if not same_class_with_interactions and original_class_title:
                 st.write("None found")
 
@@ -151,7 +175,7 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
                         st.markdown(f"**{drug_class}**")
                         # Sort by max severity
                         items_with_interactions.sort(key=lambda x: x['max_severity'])
-                        display_alternatives_with_interactions(items_with_interactions, drug_classes_lower)
+                        display_alternatives_with_interactions(items_with_interactions, drug_classes_lower, indications)
             
             # Show drugs without a class that have interactions
             unknown_class_with_interactions = [item for item in unknown_class_drugs if item['interactions']]
@@ -162,20 +186,18 @@ def alternative_results_with_drug_classes(drug, index, dict, drug_classes, origi
                     st.markdown("**Other drugs, classification not available**")
                 # Sort by max severity
                 unknown_class_with_interactions.sort(key=lambda x: x['max_severity'])
-                display_alternatives_with_interactions(unknown_class_with_interactions, drug_classes_lower)
+                display_alternatives_with_interactions(unknown_class_with_interactions, drug_classes_lower, indications)
 
             if not other_classes_with_interactions and not unknown_class_with_interactions and original_class_title:
                 st.write("None found")
 
 
-def display_alternatives_grid(items, drug_classes_lower):
+def display_alternatives_grid(items, drug_classes_lower, indications):
     """Display alternatives in a grid layout without interactions"""
     cols = st.columns(3)
     for i, item in enumerate(items):
         with cols[i % 3]:
-            indications = api_call("single_drug_indications", params={"drug_name": item["drug_concept_name"]})
-            indications_df = pd.DataFrame(indications) if indications else pd.DataFrame()
-            indications_str = ", ".join(indications_df['event_concept_name']) if not indications_df.empty else ""
+            indications_str = ", ".join(indications.get(item['drug_concept_name']) or [])
             
             drug_class = drug_classes_lower.get(item['drug_concept_name'].lower(), '')
             st.markdown(
@@ -183,7 +205,7 @@ def display_alternatives_grid(items, drug_classes_lower):
                 help=f"Drug class: {drug_class}\nIndications: {indications_str}"
             )
 
-def display_alternatives_with_interactions(items, drug_classes_lower):
+def display_alternatives_with_interactions(items, drug_classes_lower, indications):
     """Display alternatives with interactions in a condensed format"""
     for item in items:
         # Create a container with border instead of an expander
@@ -191,13 +213,7 @@ def display_alternatives_with_interactions(items, drug_classes_lower):
             # Header section - more compact layout
             cols = st.columns([3, 2])
             with cols[0]:
-                indications = api_call("single_drug_indications", params={"drug_name": item["drug_concept_name"]})
-                indications_df = pd.DataFrame(indications) if indications else pd.DataFrame()
-                if not indications_df.empty:
-                    indications_df.columns = NAME_EVENT_COLUMNS
-                    indications_str = ", ".join(indications_df['event_concept_name'])
-                else:
-                    indications_str = ""
+                indications_str = ", ".join(indications.get(item['drug_concept_name']) or [])
                 
                 drug_class = drug_classes_lower.get(item['drug_concept_name'].lower(), '')
                 st.markdown(
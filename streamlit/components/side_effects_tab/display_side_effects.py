@@ -1,62 +1,39 @@
 import streamlit as st
 import pandas as pd
-from constants import frequency_values, frequency_colour_map, vaccine_list
+from constants import frequency_values, frequency_colour_map, vaccine_list, SIDE_EFFECT_TABLE_PAGE_ROWS
 from collections import Counter
-from components.side_effects_tab.process_side_effects import process_side_effects, process_side_effects_hlt
+from utils import select_page
+from components.side_effects_tab.process_side_effects import TOTAL_COLUMN, process_side_effects, process_side_effects_hlt
 
-def display_side_effects_table(data, hlt=True, key_suffix=""):
-    """ Display side effects table """
+CELL_STYLES = {value: f'background-color: {colour}59' for value, colour in frequency_colour_map.items()}  # 59 is hex for 35% opacity
+
+def cell_styles(df):
+    """ CSS for every cell, coloured by its score (the highest one listed for grouped cells) """
+    codes, values = pd.factorize(df.to_numpy().ravel(), use_na_sentinel=False)
+    # Grouped cells read "1 (x2), 4 (x1)" with scores ascending, so the last one is the highest
+    scores = pd.Series(values, dtype=object).str.rsplit(', ', n=1).str[-1].str.split(' ', n=1).str[0]
+    styles = scores.map(CELL_STYLES).fillna('').to_numpy()
+    return pd.DataFrame(styles[codes].reshape(df.shape), index=df.index, columns=df.columns)
+
+@st.fragment
+def display_side_effects_table(data, hlt=True, key_suffix="", tables=None):
+    """ Display side effects table, rerun on its own when grouped or paged
+
+    tables holds the tables already pivoted from data, keyed by whether they are grouped by HLT.
+    """
     if hlt:
         hlt = st.checkbox("Group side effects by Higher Level Term", 
                           value=False, 
                           key=f"hlt_checkbox_{key_suffix}")
 
-    if hlt:
-        df = process_side_effects_hlt(data)
-    else:
-        df = process_side_effects(data)
-
-    if not hlt:
-        def style_cell(val):
-            # Get the current column name from the styler context
-            column = style_cell.column_name
-            
-            # Skip styling for Total Score column
-            if column == 'Total Frequency Score':
-                return ''
-            
-            if val in frequency_colour_map:
-                color = frequency_colour_map[val]
-                return f'background-color: {color}59'  # 59 is hex for 35% opacity
-            return ''
-
-        # Apply styling using .map instead of .applymap
-        styled_df = df.style
-        for column in df.columns:
-            if column != 'Total Frequency Score':
-                style_cell.column_name = column
-                styled_df = styled_df.map(style_cell, subset=[column])
-    if hlt:
-        def style_cell(val):
-            # Get the current column name from the styler context
-            column = style_cell.column_name
-            
-            # Skip styling for Total Score column
-            if column == 'Total Frequency Score':
-                return ''
-            
-            for f in frequency_colour_map.keys():
-                if f in val:
-                    color = frequency_colour_map[f]
-                    return f'background-color: {color}59'  # 59 is hex for 35% opacity
-            return ''
-        
-        styled_df = df.style
-        for column in df.columns:
-            if column != 'Total Frequency Score':
-                style_cell.column_name = column
-                styled_df = styled_df.map(style_cell, subset=[column])
+    df = (tables or {}).get(hlt)
+    if df is None:
+        df = process_side_effects_hlt(data) if hlt else process_side_effects(data)
 
+    # Only the rows on screen are styled, in one pass, skipping the Total Score column
+    page_df = select_page(df, SIDE_EFFECT_TABLE_PAGE_ROWS, key=f"side_effect_page_{key_suffix}_{'hlt' if hlt else 'events'}")
+    score_columns = [column for column in page_df.columns if column != TOTAL_COLUMN]
+    styled_df = page_df.style.apply(cell_styles, axis=None, subset=score_columns)
 
     st.dataframe(
         styled_df,
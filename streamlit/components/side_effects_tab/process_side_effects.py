@@ -1,87 +1,132 @@
+import numpy as np
 import pandas as pd
-from collections import Counter
 from constants import frequency_values, frequency_colour_map
 
+TOTAL_COLUMN = 'Total Frequency Score'
+
+def _int_labels(values):
+    """ str(int(x)) for every value, sharing one string object per distinct integer """
+    ints = values.astype(np.int64)
+    if not ints.size:
+        return ints.astype(object)
+    low = ints.min()
+    labels = np.array([str(i) for i in range(low, ints.max() + 1)], dtype=object)
+    return labels[ints - low]
+
+def _factorize(values):
+    """ pd.factorize(sort=True), with the distinct values sorted as plain values for categoricals too """
+    codes, uniques = pd.factorize(values, sort=True)
+    uniques = np.asarray(uniques, dtype=object)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Categories come in category order, not necessarily sorted
+        order = np.argsort(uniques, kind='stable')
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        codes, uniques = np.where(codes >= 0, rank[np.maximum(codes, 0)], -1), uniques[order]
+    return codes, pd.Index(uniques, dtype=object)
+
+def _frequency_scores(frequency):
+    """ frequency_values score of each row, NaN where the frequency has no score """
+    codes, labels = pd.factorize(frequency)
+    scores = np.append(pd.Index(labels, dtype=object).map(frequency_values).to_numpy(dtype=float), np.nan)
+    return scores[codes]
+
+def _finish_table(cells, totals, events, drugs, total_labels):
+    """ Sort the (event x drug) cell strings by total score and lay them out for display """
+    # Same sort as DataFrame.sort_values on the total column, so ties keep the same order
+    order = pd.Series(totals).sort_values(ascending=False).index.to_numpy()
+
+    # Interaction columns first, then the single drugs
+    column_order = [i for i, drug in enumerate(drugs) if '+' in str(drug)] + \
+                   [i for i, drug in enumerate(drugs) if '+' not in str(drug)]
+
+    table = pd.DataFrame(
+        cells[order][:, column_order],
+        index=events[order].rename('Side Effect'),
+        columns=drugs[column_order],
+    )
+    table.insert(0, TOTAL_COLUMN, total_labels[order])
+    return table
+
 def process_side_effects(df):
     """ Collate side effects data into table overview """   
     # Calculate frequency scores
-    frequency_scores = df.copy()
-    frequency_scores['freq_value'] = frequency_scores['frequency'].map(frequency_values)
-    
-    # Create pivot table with numerical values
-    pivot_df = frequency_scores.pivot_table(
-        values='freq_value',
-        index='event_concept_name',
-        columns='drug_concept_name',
-        aggfunc='max'
-    )
-    
-    # Calculate and add total frequency score column
-    total_frequencies = frequency_scores.groupby('event_concept_name')['freq_value'].sum()
-    pivot_df.insert(0, 'Total Frequency Score', total_frequencies)
-    
-    # Sort by total frequency score
-    pivot_df = pivot_df.sort_values('Total Frequency Score', ascending=False)
-    
-    # Convert numerical values to strings with custom mapping
-    for col in pivot_df.columns:
-        pivot_df[col] = pivot_df[col].apply(lambda x: str(int(x)) if pd.notnull(x) and x != '-' else '-')
-        if ' + ' in col:
-            pivot_df[col] = pivot_df[col].apply(lambda x: '*' if pd.notnull(x) and x != '-' else '-')
-    
-    # Reorder columns to show interaction columns first
-    columns = list(pivot_df.columns)
-    interaction_cols = [col for col in columns if '+' in str(col)]
-    other_cols = [col for col in columns if '+' not in str(col)]
-    new_column_order = ['Total Frequency Score'] + interaction_cols + other_cols[1:]  # Skip 'Total Frequency Score' in other_cols
-    pivot_df = pivot_df[new_column_order]
-    
-    pivot_df = pivot_df.rename_axis('Side Effect')
-    return pivot_df
+    freq_value = _frequency_scores(df['frequency'])
+    event_codes, events = _factorize(df['event_concept_name'])
+    drug_codes, drugs = _factorize(df['drug_concept_name'])
+
+    # Highest frequency score of each (event, drug) cell
+    valid = (event_codes >= 0) & (drug_codes >= 0) & ~np.isnan(freq_value)
+    matrix = np.full((len(events), len(drugs)), np.nan)
+    np.fmax.at(matrix, (event_codes[valid], drug_codes[valid]), freq_value[valid])
+
+    # Calculate total frequency score per event, missing frequencies counting as zero
+    has_event = event_codes >= 0
+    totals = np.bincount(event_codes[has_event], weights=np.nan_to_num(freq_value[has_event]), minlength=len(events))
+
+    # Leave out events and drugs without any frequency, as pivot_table does. Without any
+    # frequency at all the totals alone were left, listing every event with a total of 0
+    missing = np.isnan(matrix)
+    rows, cols = ~missing.all(axis=1), ~missing.all(axis=0)
+    if not rows.any():
+        rows = np.ones(len(events), dtype=bool)
+    matrix, missing, totals = matrix[rows][:, cols], missing[rows][:, cols], totals[rows]
+    events = pd.Index(events[rows], name='event_concept_name')
+    drugs = pd.Index(drugs[cols], name='drug_concept_name')
+
+    # Convert numerical values to strings, marking interaction cells with '*'
+    is_interaction = np.array([' + ' in str(drug) for drug in drugs], dtype=bool)
+    digits = _int_labels(np.where(missing, 0, matrix))
+    cells = np.where(missing, '-', np.where(is_interaction, '*', digits))
+
+    return _finish_table(cells, totals, events, drugs, _int_labels(totals))
 
 def process_side_effects_hlt(df):
-        # Calculate frequency scores
-    frequency_scores = df.copy()
-    frequency_scores['freq_value'] = frequency_scores['frequency'].map(frequency_values)
-
-    def custom_agg_function(values):
-        counts = []
-        set_of_values = set(values)
-        if len(set_of_values) > 0:
-            counter = Counter(values)
-            for v in set_of_values:
-                if counter[v] > 0:
-                    counts.append(f'{int(v)} (x{counter[v]})')
-        return ', '.join(counts)
+    """ Collate side effects data into table overview, grouped by high level term """
+    # Calculate frequency scores
+    freq_value = _frequency_scores(df['frequency'])
+
     # Replace null or None ancestors with event_concept_name
-    frequency_scores['ancestor'] = frequency_scores['ancestor'].where(frequency_scores['ancestor'].notnull(), frequency_scores['event_concept_name'])
-
-    # Create pivot table with numerical values
-    pivot_df = frequency_scores.pivot_table(
-        values='freq_value',
-        index='ancestor',
-        columns='drug_concept_name',
-        aggfunc=custom_agg_function,
-    )
-        # Calculate and add total frequency score column
-    total_frequencies = frequency_scores.groupby('ancestor')['freq_value'].sum()
-    pivot_df.insert(0, 'Total Frequency Score', total_frequencies)
-
-    # Sort by total frequency score
-    pivot_df = pivot_df.sort_values('Total Frequency Score', ascending=False)
-    
-    # # Convert numerical values to strings with custom mapping
-    for col in pivot_df.columns:
-        pivot_df[col] = pivot_df[col].apply(lambda x: x if pd.notnull(x) and x != '-' else '-')
-        if ' + ' in col:
-            pivot_df[col] = pivot_df[col].apply(lambda x: '*' if pd.notnull(x) and x != '-' else '-')
-    
-    # Reorder columns to show interaction columns first
-    columns = list(pivot_df.columns)
-    interaction_cols = [col for col in columns if '+' in str(col)]
-    other_cols = [col for col in columns if '+' not in str(col)]
-    new_column_order = ['Total Frequency Score'] + interaction_cols + other_cols[1:]  # Skip 'Total Frequency Score' in other_cols
-    pivot_df = pivot_df[new_column_order]
-    
-    pivot_df = pivot_df.rename_axis('Side Effect')    
-    return pivot_df
\ No newline at end of file
+    ancestor = df['ancestor'].to_numpy(dtype=object)
+    ancestor = pd.Series(np.where(pd.isna(ancestor), df['event_concept_name'].to_numpy(dtype=object), ancestor))
+    ancestor_codes, ancestors = _factorize(ancestor)
+    drug_codes, drugs = _factorize(df['drug_concept_name'])
+
+    # Every (ancestor, drug) group gets a cell, even if none of its rows has a frequency score
+    grouped = (ancestor_codes >= 0) & (drug_codes >= 0)
+    present = np.zeros((len(ancestors), len(drugs)), dtype=bool)
+    present[ancestor_codes[grouped], drug_codes[grouped]] = True
+
+    # Number of rows with each frequency score per (ancestor, drug), i.e. the groupby
+    # on (ancestor, drug, freq_value) with size(), as an (ancestor x drug x score) array
+    scored = grouped & ~np.isnan(freq_value)
+    score_codes, scores = pd.factorize(freq_value[scored], sort=True)
+    flat = (ancestor_codes[scored] * len(drugs) + drug_codes[scored]) * len(scores) + score_codes
+    counts = np.bincount(flat, minlength=present.size * len(scores)).reshape(*present.shape, len(scores))
+
+    # Format as "1 (x2), 4 (x1)", one score at a time in ascending order
+    cells = np.full(present.shape, '', dtype=object)
+    for k, score in enumerate(scores):
+        has_score = counts[:, :, k] > 0
+        piece = f'{int(score)} (x' + _int_labels(counts[:, :, k][has_score]) + ')'
+        previous = cells[has_score]
+        cells[has_score] = np.where(previous == '', piece, previous + ', ' + piece)
+
+    # Calculate total frequency score per ancestor, integer unless some frequencies have no score
+    has_ancestor = ancestor_codes >= 0
+    totals = np.bincount(ancestor_codes[has_ancestor], weights=np.nan_to_num(freq_value[has_ancestor]),
+                         minlength=len(ancestors))
+    if not np.isnan(freq_value).any():
+        totals = totals.astype(np.int64)
+
+    # Leave out ancestors and drugs without any group, as pivot_table does
+    rows, cols = present.any(axis=1), present.any(axis=0)
+    cells, present, totals = cells[rows][:, cols], present[rows][:, cols], totals[rows]
+    ancestors = pd.Index(ancestors[rows], name='ancestor')
+    drugs = pd.Index(drugs[cols], name='drug_concept_name')
+
+    # Mark interaction cells with '*'
+    is_interaction = np.array([' + ' in str(drug) for drug in drugs], dtype=bool)
+    cells = np.where(present, np.where(is_interaction, '*', cells), '-')
+
+    return _finish_table(cells, totals, ancestors, drugs, totals)
@@ -1,3 +1,76 @@
+import os
+
+# API Client
+# Point at a local stand-in with e.g. DDI_API_URL=http://127.0.0.1:8000
+API_BASE_URL = os.environ.get("DDI_API_URL", "https://ddi-fast-api.onrender.com").rstrip("/")
+API_POOL_SIZE = 20  # Keep-alive connections held open to the API host
+API_MAX_RETRIES = 3  # Retries for connection errors and render.com cold-start 5xx responses, not for read timeouts
+API_RETRY_BACKOFF = 0.5  # Seconds, doubled after each retry
+API_RETRY_STATUSES = [502, 503, 504]
+API_MAX_CONCURRENCY = 8  # Worker threads per fan-out, kept below API_POOL_SIZE
+API_DEFAULT_TIMEOUT = (3.05, 30)  # (connect, read) seconds
+API_TIMEOUTS = {
+    'drug_names': (3.05, 60),
+    'barkla_drug_names': (3.05, 60),
+    'barkla_side_effects_names': (3.05, 60),
+    'faers_drug_names': (3.05, 60),
+    'interactions': (3.05, 45),
+    'side_effects': (3.05, 45),
+    'ancestor_side_effects': (3.05, 45),
+}
+
+# Dataset Version
+# Part of every cached lookup and search result key. Write a new version to the file when the
+# API's datasets are updated, and older entries stop being used without a restart
+DATA_VERSION = os.environ.get("DDI_DATA_VERSION", "1")
+DATA_VERSION_FILE = os.environ.get("DDI_DATA_VERSION_FILE", "")
+
+# API Response Cache (shared by all sessions)
+API_CACHE_MAX_BYTES = 256 * 1024 * 1024
+API_CACHE_TTLS = {  # Seconds; endpoints not listed here are never cached
+    # Reference data
+    'drug_names': 6 * 60 * 60,
+    'barkla_drug_names': 6 * 60 * 60,
+    'barkla_side_effects_names': 6 * 60 * 60,
+    'faers_drug_names': 6 * 60 * 60,
+    # Lookups against static datasets
+    'interactions': 60 * 60,
+    'side_effects': 60 * 60,
+    'ancestor_side_effects': 60 * 60,
+    'indications': 60 * 60,
+    'single_drug_indications': 60 * 60,
+    'drug_classes': 60 * 60,
+    'alternative_search': 60 * 60,
+    'alternative_interactions': 60 * 60,
+    'culprit_drug': 60 * 60,
+    'admission_details': 60 * 60,
+    'most_likely_side_effects': 60 * 60,
+    'most_likely_side_effects_faers': 60 * 60,
+}
+
+# Search Result Cache (shared by all sessions)
+SEARCH_CACHE_MAX_BYTES = 128 * 1024 * 1024  # Processed frames and tables of recent portfolios
+SEARCH_CACHE_TTL = 60 * 60  # Seconds, as for the lookups the results are built from
+
+# Local Interaction Snapshot
+INTERACTION_SNAPSHOT = os.environ.get("DDI_INTERACTION_SNAPSHOT", "")  # Directory written by interaction_index.py; searches screen against it in-process when set
+INTERACTION_SNAPSHOT_CHUNK = 200  # Names per half of each interactions request while writing the snapshot
+
+# Local Side Effect Snapshot
+SIDE_EFFECT_SNAPSHOT = os.environ.get("DDI_SIDE_EFFECT_SNAPSHOT", "")  # Directory written by side_effect_index.py; searches read side effects and HLTs from it when set
+SIDE_EFFECT_SNAPSHOT_CHUNK = 200  # Drugs or events per request while writing the snapshot
+
+# OCR
+OCR_LANGUAGES = ['en']
+OCR_NUM_THREADS = int(os.environ.get("DDI_OCR_THREADS", "0"))  # CPU threads for the OCR models; 0 keeps the torch default
+OCR_WARM_UP = os.environ.get("DDI_OCR_WARM_UP", "1") == "1"  # Load the reader when the app first starts
+OCR_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Annotated images and detections, shared by all sessions
+OCR_MAX_SIDE = 1600  # Pixels; longer photos are downsampled before detection
+OCR_CROP_TO_TEXT = False  # Crop to the bounding box of the dark (text) pixels before detection
+OCR_DESKEW = False  # Straighten photos taken at a slight angle before detection
+
+# Drug Name Matching
+NAME_MATCH_MAX_TOKENS = 4  # Longest multi-word name looked for across OCR fragments
 
 # Search Constants 
 LIFESTYLE_FACTORS = ['Alcoholic beverage', 'cranberry', 'grapefruit', 'peppermint'] #, 'eicosapentaenoic acid', 'magnesium']
@@ -19,6 +92,20 @@ SIDE_EFFECT_COLUMNS = [
     'frequency', 
     'source'
 ]
+# Held as categoricals in the typed frames, as the same names and labels repeat on many rows
+CATEGORICAL_COLUMNS = [
+    'drug_a_concept_name',
+    'drug_b_concept_name',
+    'drug_concept_name',
+    'event_concept_name',
+    'frequency',
+    'source',
+    'evidence',
+    'description'
+]
+SMALL_INTEGER_COLUMNS = [
+    'severity_code'
+]
 NAME_EVENT_COLUMNS = [
     'drug_concept_name', 
     'event_concept_name'
@@ -49,6 +136,12 @@ frequency_colour_map = {
     '-': '#e9ecef',   # light grey
     }
 
+#  Interaction Cards
+INTERACTION_CARDS_PAGE_SIZE = int(os.environ.get("DDI_INTERACTION_PAGE_SIZE", "10"))  # Cards built per page, most severe first; 0 shows every card
+
+#  Side Effect Table Pages
+SIDE_EFFECT_TABLE_PAGE_ROWS = int(os.environ.get("DDI_SIDE_EFFECT_PAGE_ROWS", "500"))  # Longer tables are shown a page at a time; 0 shows every row
+
 #  Vaccine List
 vaccine_list = [
 
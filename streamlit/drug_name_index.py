@@ -0,0 +1,126 @@
+import hashlib
+import re
+from collections import defaultdict
+
+import streamlit as st
+
+from constants import NAME_MATCH_MAX_TOKENS
+
+# Strengths, volumes and other dose fragments that follow drug names on labels and prescriptions
+DOSE_PATTERN = re.compile(r"^\d+([.,]\d+)?(mg|mcg|micrograms?|g|ml|l|units?|iu|%)?$|^(mg|mcg|micrograms?|g|ml|units?|iu|%)$")
+PUNCTUATION = re.compile(r"[^\w\s%.-]|(?<!\d)[.-]|[.-](?!\d)")
+
+
+def normalise(text):
+    """ Lower case, punctuation stripped and whitespace collapsed """
+    return " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _max_distance(text):
+    # Short words are too easily one edit away from an unrelated drug name
+    if len(text) < 5:
+        return 0
+    return 1 if len(text) < 9 else 2
+
+def _edit_distance(a, b, limit):
+    """ Levenshtein distance, or limit + 1 as soon as it is known to exceed limit """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class DrugNameIndex:
+    """ Exact and bounded edit distance lookup of drug names in free text """
+
+    def __init__(self, drug_names):
+        self.names = {}  # normalised -> canonical name
+        for name in drug_names:
+            self.names.setdefault(normalise(name), name)
+        # Changes with the names, for caches of what was matched against them
+        self.version = hashlib.sha256("\n".join(sorted(self.names.values())).encode()).hexdigest()
+        self.max_tokens = min(NAME_MATCH_MAX_TOKENS, max((len(name.split()) for name in self.names), default=1))
+        self._keys = list(self.names)
+        self._by_trigram = defaultdict(list)
+        for key_id, key in enumerate(self._keys):
+            for trigram in _trigrams(key):
+                self._by_trigram[trigram].append(key_id)
+
+    def match(self, text):
+        """ Canonical drug name for a single name, or None """
+        text = normalise(text)
+        if not text:
+            return None
+        name = self.names.get(text)
+        if name is not None:
+            return name
+        limit = _max_distance(text)
+        if limit == 0:
+            return None
+
+        # Only names sharing enough trigrams can be within limit edits
+        trigrams = _trigrams(text)
+        shared = defaultdict(int)
+        for trigram in trigrams:
+            for key_id in self._by_trigram.get(trigram, ()):
+                shared[key_id] += 1
+        min_shared = len(trigrams) - 3 * limit
+        best, best_distance = None, limit + 1
+        for key_id, count in shared.items():
+            if count < min_shared:
+                continue
+            distance = _edit_distance(text, self._keys[key_id], limit)
+            if distance < best_distance:
+                best, best_distance = self._keys[key_id], distance
+        return self.names[best] if best is not None else None
+
+    def match_record(self, text):
+        """ Canonical drug name for a name from a structured record, such as a prescription, or None
+
+        Doses are dropped and the rest must match a name exactly: a near miss in a record is
+        more likely another drug, such as prednisone for prednisolone, than a misreading.
+        """
+        return self.names.get(" ".join(token for token in normalise(text).split() if not DOSE_PATTERN.match(token)))
+
+    def find(self, texts):
+        """ Drug names in a sequence of text fragments, such as OCR detections in reading order
+
+        Names may be split across fragments or surrounded by other words and doses. Returns
+        (name, fragment indices) pairs, taking the longest match first at each position.
+        """
+        tokens = [(token, i) for i, text in enumerate(texts) for token in normalise(text).split()]
+        found = []
+        start = 0
+        while start < len(tokens):
+            for length in range(min(self.max_tokens, len(tokens) - start), 0, -1):
+                window = tokens[start:start + length]
+                if DOSE_PATTERN.match(window[0][0]) or DOSE_PATTERN.match(window[-1][0]):
+                    continue
+                name = self.match(" ".join(token for token, _ in window))
+                if name is not None:
+                    found.append((name, sorted({i for _, i in window})))
+                    start += length
+                    break
+            else:
+                start += 1
+        return found
+
+    def find_names(self, texts):
+        """ Distinct drug names in a sequence of text fragments, in order of appearance """
+        return list(dict.fromkeys(name for name, _ in self.find(texts)))
+
+
+@st.cache_resource(show_spinner=False)
+def get_drug_name_index(drug_names):
+    """ Name index over the reference drug list, shared by every Streamlit session """
+    return DrugNameIndex(drug_names or [])
@@ -0,0 +1,183 @@
+""" In-process lookup of drug-drug interactions from a local snapshot of the DDI dataset.
+
+Write or refresh the snapshot from the API with
+
+    python streamlit/interaction_index.py path/to/snapshot
+
+and set DDI_INTERACTION_SNAPSHOT to that path for searches to screen against it.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils import api_call, api_call_many, fetch_interactions
+from snapshot import casefold_groups, concatenated_ranges, lookup_table, read_snapshot, snapshot_stamp, write_snapshot
+from constants import (DDI_COLUMNS, INTERACTION_SNAPSHOT, INTERACTION_SNAPSHOT_CHUNK, LIFESTYLE_FACTORS,
+                       SMALL_INTEGER_COLUMNS, vaccine_list)
+
+DRUG_COLUMNS = ['drug_a_concept_name', 'drug_b_concept_name']
+
+
+def _pair_keys(group_a, group_b, count):
+    """ One integer per unordered pair of drug ids """
+    return np.minimum(group_a, group_b) * count + np.maximum(group_a, group_b)
+
+
+class InteractionIndex:
+    """ Interaction rows sorted by drug pair, so a pair's rows are found by binary search """
+
+    def __init__(self, arrays, vocabulary):
+        self.pair_keys = arrays['pair_keys']
+        self.columns = {column: arrays[column] for column in DDI_COLUMNS}
+        self.count = len(vocabulary['drugs'])
+        _, self.ids = casefold_groups(vocabulary['drugs'])
+        self.names = {column: lookup_table(vocabulary['drugs' if column in DRUG_COLUMNS else column])
+                      for column in DDI_COLUMNS if column not in SMALL_INTEGER_COLUMNS}
+
+    def __len__(self):
+        return len(self.pair_keys)
+
+    def unknown(self, drug_list):
+        """ Names that are not in the snapshot """
+        return [drug for drug in dict.fromkeys(drug_list) if drug.casefold() not in self.ids]
+
+    def interactions(self, drug_list):
+        """ Interaction rows between every pair of drugs, as the API returns them
+
+        Rows come in the order of the pairs, as in fetch_interactions, and in snapshot
+        order within a pair. Pairs with a name missing from the snapshot are left out, see
+        screen_interactions.
+        """
+        drugs = list(dict.fromkeys(drug_list))
+        ids = np.array([self.ids.get(drug.casefold(), -1) for drug in drugs], dtype=np.int64)
+        first, second = np.triu_indices(len(drugs), 1)
+        known = (ids[first] >= 0) & (ids[second] >= 0)
+        keys = _pair_keys(ids[first][known], ids[second][known], self.count)
+
+        starts = np.searchsorted(self.pair_keys, keys, side='left')
+        lengths = np.searchsorted(self.pair_keys, keys, side='right') - starts
+        rows = concatenated_ranges(starts, lengths)
+
+        values = []
+        for column in DDI_COLUMNS:
+            codes = np.asarray(self.columns[column][rows])
+            if column in SMALL_INTEGER_COLUMNS:
+                values.append([None if code < 0 else code for code in codes.tolist()])
+            else:
+                values.append(self.names[column][codes].tolist())
+        return [dict(zip(DDI_COLUMNS, row)) for row in zip(*values)]
+
+
+def build_interaction_snapshot(rows, path, names=()):
+    """ Write interaction rows, as the API returns them, to a snapshot directory
+
+    names are the drugs the rows were fetched for, so the snapshot knows the ones without interactions too.
+    """
+    df = pd.DataFrame(rows, columns=DDI_COLUMNS)
+    columns = [df[column] for column in DRUG_COLUMNS] + [pd.Series(list(names), dtype=object)]
+    drug_codes, drugs = pd.factorize(pd.concat(columns, ignore_index=True))
+    code_a, code_b = drug_codes[:len(df)], drug_codes[len(df):2 * len(df)]
+    groups, _ = casefold_groups(drugs)
+    keys = _pair_keys(groups[code_a], groups[code_b], len(drugs))
+    order = np.argsort(keys, kind='stable')  # Keeps the API order within a pair
+
+    arrays = {'pair_keys': keys[order], 'drug_a_concept_name': code_a[order], 'drug_b_concept_name': code_b[order]}
+    vocabulary = {'drugs': drugs.tolist()}
+    for column in DDI_COLUMNS:
+        if column in DRUG_COLUMNS:
+            continue
+        if column in SMALL_INTEGER_COLUMNS:
+            arrays[column] = pd.to_numeric(df[column]).fillna(-1).to_numpy(np.int16)[order]
+        else:
+            codes, uniques = pd.factorize(df[column])
+            arrays[column] = codes.astype(np.int32)[order]
+            vocabulary[column] = uniques.tolist()
+    arrays['drug_a_concept_name'] = arrays['drug_a_concept_name'].astype(np.int32)
+    arrays['drug_b_concept_name'] = arrays['drug_b_concept_name'].astype(np.int32)
+    write_snapshot(path, arrays, vocabulary)
+
+def fetch_all_interactions(names, chunk_size=INTERACTION_SNAPSHOT_CHUNK):
+    """ Interaction rows between every pair of names, one request per pair of chunks of names
+
+    Returns None if a request failed.
+    """
+    names = list(dict.fromkeys(names))
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)] or [[]]
+    chunk_of = {name.casefold(): i for i, chunk in enumerate(chunks) for name in chunk}
+    if len(chunks) == 1:
+        calls = [(0, 0)]
+    else:
+        calls = [(i, j) for i in range(len(chunks)) for j in range(i + 1, len(chunks))]
+
+    def owner(row):
+        # Pairs within one chunk come back from every call with that chunk, so keep them from one
+        i, j = sorted(chunk_of.get(row[column].casefold(), -1) for column in DRUG_COLUMNS)
+        if i != j or len(chunks) == 1:
+            return i, j
+        return (i, i + 1) if i + 1 < len(chunks) else (i - 1, i)
+
+    results = api_call_many("interactions", [{"drug_list": chunks[i] + chunks[j] if i != j else chunks[i]}
+                                             for i, j in calls], show_error=False, cache=False)
+    if any(result is None for result in results):
+        return None
+    return [row for call, result in zip(calls, results) for row in result if owner(row) == call]
+
+def screen_interactions(index, drug_list):
+    """ Interaction rows between every pair of drugs, from the snapshot where it knows both drugs
+
+    Pairs with a drug the snapshot does not know, such as one added to the dataset since it
+    was written, are fetched from the API and follow the snapshot's rows. Returns None if
+    that request failed.
+    """
+    rows = index.interactions(drug_list)
+    unknown = index.unknown(drug_list)
+    if not unknown:
+        return rows
+    fetched = fetch_interactions(drug_list, involving=unknown)
+    return None if fetched is None else rows + fetched
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_interaction_index(path, stamp):
+    return InteractionIndex(*read_snapshot(path))
+
+def interaction_snapshot_stamp():
+    """ snapshot_stamp of DDI_INTERACTION_SNAPSHOT, or None when it is not set or not written yet """
+    return snapshot_stamp(INTERACTION_SNAPSHOT) if INTERACTION_SNAPSHOT else None
+
+def get_interaction_index():
+    """ Index of the snapshot in DDI_INTERACTION_SNAPSHOT, shared by every session, or None when it is not set
+
+    A rewritten snapshot is loaded on the first lookup after the refresh. None too while
+    there is no snapshot to read, so searches fetch from the API instead.
+    """
+    stamp = interaction_snapshot_stamp()
+    if stamp is None:
+        return None
+    try:
+        return _load_interaction_index(INTERACTION_SNAPSHOT, stamp)
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a snapshot of every drug-drug interaction from the API")
+    parser.add_argument("path", help="Snapshot path, a link replaced by one to the new snapshot")
+    parser.add_argument("--chunk-size", type=int, default=INTERACTION_SNAPSHOT_CHUNK,
+                        help="Names per half of each interactions request")
+    args = parser.parse_args()
+
+    drug_names = api_call("drug_names", show_error=False)
+    if drug_names is None:
+        raise SystemExit("Failed to fetch drug_names.")
+    names = [*drug_names, *LIFESTYLE_FACTORS, *vaccine_list]
+    rows = fetch_all_interactions(names, args.chunk_size)
+    if rows is None:
+        raise SystemExit("Failed to fetch interactions.")
+    build_interaction_snapshot(rows, args.path, names)
+    print(f"Wrote {len(rows)} interactions to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
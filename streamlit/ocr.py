@@ -0,0 +1,113 @@
+import hashlib
+
+import cv2
+import numpy as np
+import streamlit as st
+import easyocr
+
+from utils import LRUCache, data_version
+from constants import (OCR_LANGUAGES, OCR_NUM_THREADS, OCR_CACHE_MAX_BYTES, OCR_MAX_SIDE,
+                       OCR_CROP_TO_TEXT, OCR_DESKEW)
+
+
+@st.cache_resource(show_spinner="Loading text recognition models...")
+def get_ocr_reader():
+    """ Process-wide EasyOCR reader, shared by every Streamlit session """
+    if OCR_NUM_THREADS:
+        import torch  # Installed with easyocr
+        torch.set_num_threads(OCR_NUM_THREADS)
+    return easyocr.Reader(OCR_LANGUAGES)
+
+@st.cache_resource(show_spinner=False)
+def warm_up_ocr_reader():
+    """ Load the reader and run one detection so the first upload does not pay for it """
+    reader = get_ocr_reader()
+    blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+    reader.readtext(blank)
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_ocr_cache():
+    """ OCR results keyed on the image content, shared by every Streamlit session """
+    return LRUCache(OCR_CACHE_MAX_BYTES)
+
+def image_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def _text_mask(img):
+    # Dark ink on light paper, smeared so the characters of a line join up
+    grey = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(grey, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return cv2.dilate(mask, np.ones((3, 15), np.uint8))
+
+def _deskew(img):
+    coords = cv2.findNonZero(_text_mask(img))
+    if coords is None:
+        return img
+    _, (width, height), angle = cv2.minAreaRect(coords)
+    if width < height:
+        angle += 90  # Measure along the long side, i.e. the text lines
+    angle = (angle + 45) % 90 - 45  # The reported range differs between OpenCV versions
+    if abs(angle) < 0.5:
+        return img
+    height, width = img.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(img, rotation, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def _crop_to_text(img, margin=20):
+    coords = cv2.findNonZero(_text_mask(img))
+    if coords is None:
+        return img
+    x, y, width, height = cv2.boundingRect(coords)
+    return img[max(0, y - margin):y + height + margin, max(0, x - margin):x + width + margin]
+
+def prepare_image(image_bytes, max_side=OCR_MAX_SIDE, deskew=OCR_DESKEW, crop_to_text=OCR_CROP_TO_TEXT):
+    """ Decode an uploaded photo once and bound its size for detection
+
+    Returns a BGR array no longer than max_side on either side, optionally straightened
+    and cropped to the text. The same array is used for OCR and for the annotated image.
+    """
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    scale = max_side / max(img.shape[:2])
+    if scale < 1:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if deskew:
+        img = _deskew(img)
+    if crop_to_text:
+        img = _crop_to_text(img)
+    return img
+
+def scan_prescription(image_bytes, name_index):
+    """ Detect drug names in a prescription photo
+
+    Returns the detected drug names and the image annotated with their bounding boxes.
+    The raw detections and the annotated image are cached on a hash of the image bytes,
+    so the same photo is only read once however it is named or whoever uploads it, and on
+    the dataset and name index versions, as the annotation shows the names matched.
+    """
+    cache = get_ocr_cache()
+    key = (image_digest(image_bytes), data_version(), name_index.version)
+    cached = cache.get(key)
+    if cached is None:
+        img = prepare_image(image_bytes)
+        detections = get_ocr_reader().readtext(img)
+
+        # Convert to RGB for display; boxes share the coordinates of the array OCR saw
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+        # Draw bounding boxes around every detection that makes up a drug name
+        for name, detection_ids in name_index.find([detection[1] for detection in detections]):
+            for detection_id in detection_ids:
+                bbox = np.array(detections[detection_id][0], dtype=np.int32).reshape((-1, 1, 2))
+                cv2.polylines(img, [bbox], True, (255, 0, 0), 3)
+            bbox = np.array(detections[detection_ids[0]][0], dtype=np.int32).reshape((-1, 1, 2))
+            cv2.putText(img, name, (bbox[0][0][0], bbox[0][0][1] - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+        img.flags.writeable = False  # Shared between sessions
+
+        cached = (detections, img)
+        cache.put(key, cached, img.nbytes + sum(len(detection[1]) + 64 for detection in detections))
+
+    detections, img = cached
+    detected_drugs = name_index.find_names([detection[1] for detection in detections])
+    return detected_drugs, img
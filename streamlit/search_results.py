@@ -0,0 +1,142 @@
+import json
+
+import streamlit as st
+
+from utils import (LRUCache, api_call, api_pipeline, data_version, fetch_ancestors, fetch_interactions,
+                   fetch_side_effects, join_interactions_and_side_effects, load_interactions, load_side_effects,
+                   partition_side_effects)
+from interaction_index import get_interaction_index, interaction_snapshot_stamp, screen_interactions
+from side_effect_index import get_side_effect_index, screen_ancestors, screen_side_effects, side_effect_snapshot_stamp
+from constants import SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL
+from components.side_effects_tab.process_side_effects import process_side_effects, process_side_effects_hlt
+
+SECTIONS = ['drugs', 'lifestyle', 'vaccines']
+
+
+@st.cache_resource(show_spinner=False)
+def get_search_cache():
+    """ Processed search results, shared by every Streamlit session """
+    return LRUCache(SEARCH_CACHE_MAX_BYTES)
+
+def search_cache_stats():
+    """ Hit, miss and eviction counters of the shared search result cache """
+    return get_search_cache().stats()
+
+def _canonical(names):
+    """ Names in case-insensitive order, keeping the first spelling of each """
+    by_casefold = {}
+    for name in names:
+        by_casefold.setdefault(name.strip().casefold(), name.strip())
+    return [by_casefold[key] for key in sorted(by_casefold)]
+
+def search_key(drugs, factors, vaccines):
+    """ Cache key of a portfolio: the current dataset and snapshot versions and each list sorted and case-normalised """
+    names = (tuple(name.casefold() for name in _canonical(names)) for names in (drugs, factors, vaccines))
+    return (data_version(), interaction_snapshot_stamp(), side_effect_snapshot_stamp(), *names)
+
+def _size(results):
+    """ Approximate bytes held by a set of search results """
+    frames = [results['interactions'], *results['interaction_sections'].values(),
+              *results['side_effect_sections'].values(),
+              *(df for tables in results['side_effect_tables'].values() for df in tables.values())]
+    size = sum(int(df.memory_usage(deep=True).sum()) for df in frames if df is not None)
+    return size + len(json.dumps(results['indications'] or {}))
+
+def _run_search(drugs, factors, vaccines):
+    # Interactions and side effects are independent, so fetch them concurrently and chain
+    # the indication and ancestor lookups on whichever of the two they need. Side effects,
+    # interactions and ancestors are cached per drug, pair and term, so editing the selection
+    # only requests what the new drugs bring in. With local snapshots the interactions,
+    # side effects and ancestors are looked up in-process instead, fetching only what a
+    # snapshot does not know
+    interaction_index = get_interaction_index()
+    side_effect_index = get_side_effect_index()
+    stages = {
+        'interactions': (
+            lambda: (fetch_interactions([*drugs, *factors, *vaccines]) if interaction_index is None
+                     else screen_interactions(interaction_index, [*drugs, *factors, *vaccines])),
+            []
+        ),
+        'side_effects': (
+            lambda: (fetch_side_effects([*drugs, *factors]) if side_effect_index is None
+                     else screen_side_effects(side_effect_index, [*drugs, *factors])),
+            []
+        ),
+        'indications': (
+            lambda interactions: api_call("indications", params={"drug_list": sorted(
+                {item['drug_a_concept_name'] for item in interactions} | {item['drug_b_concept_name'] for item in interactions}
+            )}, show_error=False),
+            ['interactions']
+        ),
+        'ancestor_side_effects': (
+            lambda side_effects: (
+                fetch_ancestors([item['event_concept_name'] for item in side_effects]) if side_effect_index is None
+                else screen_ancestors(side_effect_index, [item['event_concept_name'] for item in side_effects])),
+            ['side_effects']
+        ),
+    }
+    fetched, timings = api_pipeline(stages)
+    # A stage is skipped, and also None, when what it depends on came back empty
+    failed = [name for name, (_, dependencies) in stages.items()
+              if fetched[name] is None and all(fetched[dependency] for dependency in dependencies)]
+    results = {
+        'complete': not failed,
+        'indications': fetched['indications'],
+        'interactions': None,
+        'interaction_sections': {},
+        'side_effect_sections': {},
+        'side_effect_tables': {},
+    }
+
+    interactions = fetched['interactions']
+    if interactions:
+        interactions_df = load_interactions(interactions)  # Only the columns we want, with compact dtypes
+
+        # Corrected filtering for lifestyle interactions
+        is_lifestyle = (interactions_df['drug_a_concept_name'].isin(factors) |
+                        interactions_df['drug_b_concept_name'].isin(factors))
+        # Corrected filtering for vaccine interactions
+        is_vaccine = (interactions_df['drug_a_concept_name'].isin(vaccines) |
+                      interactions_df['drug_b_concept_name'].isin(vaccines))
+        # A lifestyle factor and vaccine pair is in both, so mask rather than drop twice
+        results['interactions'] = interactions_df
+        results['interaction_sections'] = dict(zip(SECTIONS, (
+            interactions_df[~(is_lifestyle | is_vaccine)], interactions_df[is_lifestyle], interactions_df[is_vaccine]
+        )))
+
+    side_effects = fetched['side_effects']
+    if side_effects:
+        side_effects_df = load_side_effects(side_effects, fetched['ancestor_side_effects'])  # Only the columns we want, with compact dtypes
+        if interactions:
+            # Join interactions and side effects - show the full picture
+            side_effects_df = join_interactions_and_side_effects(results['interactions'], side_effects_df)
+        sections = dict(zip(SECTIONS, partition_side_effects(side_effects_df, factors, vaccines)))
+        results['side_effect_sections'] = sections
+
+        # Pivoted once here rather than on every rerun of every session showing them,
+        # keyed by section then by whether side effects are grouped by Higher Level Term
+        tables = results['side_effect_tables']
+        if len(sections['drugs']) > 0:
+            tables['drugs'] = {True: process_side_effects_hlt(sections['drugs']),
+                               False: process_side_effects(sections['drugs'])}
+        if len(sections['lifestyle']) > 0:
+            tables['lifestyle'] = {False: process_side_effects(sections['lifestyle'])}
+    return results, timings
+
+def search_portfolio(drugs, factors, vaccines):
+    """ Interactions and side effects of a portfolio, fetched and processed once and shared by every session
+
+    Searches listing the same names in any order or case share one entry, fetched in that
+    shared order. The frames are shared between sessions and must not be modified. Results
+    of a search where a request failed are not cached. Returns the results and the timings
+    of the fetch stages, which are empty when the results came from the cache.
+    """
+    key = search_key(drugs, factors, vaccines)
+    cache = get_search_cache()
+    results = cache.get(key)
+    if results is not None:
+        return results, {}
+    results, timings = _run_search(_canonical(drugs), _canonical(factors), _canonical(vaccines))
+    if results['complete']:
+        cache.put(key, results, _size(results), ttl=SEARCH_CACHE_TTL)
+    return results, timings
@@ -0,0 +1,189 @@
+""" In-process lookup of side effects and their Higher Level Terms from a local snapshot.
+
+Write or refresh the snapshot from the API with
+
+    python streamlit/side_effect_index.py path/to/snapshot
+
+and set DDI_SIDE_EFFECT_SNAPSHOT to that path for searches to read it. The arrays are
+memory-mapped read-only, so every app process on the host shares one copy in the page cache.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils import api_call, api_call_many, fetch_ancestors, fetch_side_effects
+from snapshot import casefold_groups, concatenated_ranges, lookup_table, read_snapshot, snapshot_stamp, write_snapshot
+from constants import (SIDE_EFFECT_COLUMNS, SIDE_EFFECT_SNAPSHOT, SIDE_EFFECT_SNAPSHOT_CHUNK, LIFESTYLE_FACTORS)
+
+
+class SideEffectIndex:
+    """ Side effect rows grouped by drug, sliced out by per-drug offsets, and the HLT of every event """
+
+    def __init__(self, arrays, vocabulary):
+        self.offsets = arrays['offsets']
+        self.columns = {column: arrays[column] for column in SIDE_EFFECT_COLUMNS}
+        _, self.ids = casefold_groups(vocabulary['drugs'])
+        self.names = {column: lookup_table(vocabulary['drugs' if column == 'drug_concept_name' else column])
+                      for column in SIDE_EFFECT_COLUMNS}
+        self.event_ids = {event: i for i, event in enumerate(vocabulary['event_concept_name'])}
+        self.event_ancestors = arrays['event_ancestors']
+        self.ancestor_names = lookup_table(vocabulary['ancestors'])
+
+    def __len__(self):
+        return len(self.columns['drug_concept_name'])
+
+    def unknown(self, drug_list):
+        """ Names that are not in the snapshot """
+        return [drug for drug in dict.fromkeys(drug_list) if drug.casefold() not in self.ids]
+
+    def unknown_events(self, event_names):
+        """ Side effects that are not in the snapshot """
+        return [event for event in dict.fromkeys(event_names) if event not in self.event_ids]
+
+    def side_effects(self, drug_list):
+        """ Side effect rows of every drug, drug after drug as in fetch_side_effects
+
+        Names missing from the snapshot are left out, see screen_side_effects.
+        """
+        ids = np.array([self.ids.get(drug.casefold(), -1) for drug in dict.fromkeys(drug_list)], dtype=np.int64)
+        ids = ids[ids >= 0]
+        starts = np.asarray(self.offsets[ids])
+        rows = concatenated_ranges(starts, np.asarray(self.offsets[ids + 1]) - starts)
+
+        values = [self.names[column][np.asarray(self.columns[column][rows])].tolist() for column in SIDE_EFFECT_COLUMNS]
+        return [dict(zip(SIDE_EFFECT_COLUMNS, row)) for row in zip(*values)]
+
+    def ancestors(self, event_names):
+        """ Higher level term of every side effect that has one, as in fetch_ancestors
+
+        Side effects missing from the snapshot are left out, see screen_ancestors.
+        """
+        events = list(dict.fromkeys(event_names))
+        codes = np.array([self.event_ids.get(event, -1) for event in events], dtype=np.int64)
+        ancestors = np.where(codes >= 0, np.asarray(self.event_ancestors)[np.maximum(codes, 0)], -1)
+        return {event: ancestor for event, ancestor in zip(events, self.ancestor_names[ancestors].tolist())
+                if ancestor is not None}
+
+
+def build_side_effect_snapshot(side_effects, ancestors, path, names=()):
+    """ Write side effect rows and the HLT of each event, as the API returns them, to a snapshot directory
+
+    names are the drugs the rows were fetched for, so the snapshot knows the ones without side effects too.
+    """
+    df = pd.DataFrame(side_effects, columns=SIDE_EFFECT_COLUMNS)
+    drug_codes, drugs = pd.factorize(pd.concat([df['drug_concept_name'], pd.Series(list(names), dtype=object)],
+                                               ignore_index=True))
+    drug_codes = drug_codes[:len(df)]
+    groups, ids = casefold_groups(drugs)
+    row_groups = groups[drug_codes]
+    order = np.argsort(row_groups, kind='stable')  # Keeps the API order within a drug
+
+    arrays = {
+        'offsets': np.concatenate([[0], np.cumsum(np.bincount(row_groups, minlength=len(ids)))]),
+        'drug_concept_name': drug_codes.astype(np.int32)[order],
+    }
+    vocabulary = {'drugs': drugs.tolist()}
+    for column in SIDE_EFFECT_COLUMNS[1:]:
+        codes, uniques = pd.factorize(df[column])
+        arrays[column] = codes.astype(np.int32)[order]
+        vocabulary[column] = uniques.tolist()
+    codes, uniques = pd.factorize(pd.Series([ancestors.get(event) for event in vocabulary['event_concept_name']],
+                                            dtype=object))
+    arrays['event_ancestors'] = codes.astype(np.int32)
+    vocabulary['ancestors'] = uniques.tolist()
+    write_snapshot(path, arrays, vocabulary)
+
+def _chunks(names, chunk_size):
+    names = list(dict.fromkeys(names))
+    return [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+
+def fetch_all_side_effects(names, chunk_size=SIDE_EFFECT_SNAPSHOT_CHUNK):
+    """ Side effect rows of every name, chunk_size names per request; None if a request failed """
+    results = api_call_many("side_effects", [{"drug_list": chunk} for chunk in _chunks(names, chunk_size)],
+                            show_error=False, cache=False)
+    if any(result is None for result in results):
+        return None
+    return [row for result in results for row in result]
+
+def fetch_all_ancestors(event_names, chunk_size=SIDE_EFFECT_SNAPSHOT_CHUNK):
+    """ Higher level term of every event, chunk_size events per request; None if a request failed """
+    results = api_call_many("ancestor_side_effects", [{"pt_list": chunk} for chunk in _chunks(event_names, chunk_size)],
+                            show_error=False, cache=False)
+    if any(result is None for result in results):
+        return None
+    return {event: ancestor for result in results for event, ancestor in result.items()}
+
+def screen_side_effects(index, drug_list):
+    """ Side effect rows of every drug, from the snapshot where it knows the drug
+
+    Drugs the snapshot does not know, such as ones added to the dataset since it was
+    written, are fetched from the API and follow the snapshot's rows. Returns None if that
+    request failed.
+    """
+    rows = index.side_effects(drug_list)
+    unknown = index.unknown(drug_list)
+    if not unknown:
+        return rows
+    fetched = fetch_side_effects(unknown)
+    return None if fetched is None else rows + fetched
+
+def screen_ancestors(index, event_names):
+    """ Higher level term of every side effect that has one, fetching those the snapshot does not know
+
+    Returns None if that request failed.
+    """
+    ancestors = index.ancestors(event_names)
+    unknown = index.unknown_events(event_names)
+    if not unknown:
+        return ancestors
+    fetched = fetch_ancestors(unknown)
+    return None if fetched is None else {**ancestors, **fetched}
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_side_effect_index(path, stamp):
+    return SideEffectIndex(*read_snapshot(path))
+
+def side_effect_snapshot_stamp():
+    """ snapshot_stamp of DDI_SIDE_EFFECT_SNAPSHOT, or None when it is not set or not written yet """
+    return snapshot_stamp(SIDE_EFFECT_SNAPSHOT) if SIDE_EFFECT_SNAPSHOT else None
+
+def get_side_effect_index():
+    """ Index of the snapshot in DDI_SIDE_EFFECT_SNAPSHOT, shared by every session, or None when it is not set
+
+    A rewritten snapshot is loaded on the first lookup after the refresh. None too while
+    there is no snapshot to read, so searches fetch from the API instead.
+    """
+    stamp = side_effect_snapshot_stamp()
+    if stamp is None:
+        return None
+    try:
+        return _load_side_effect_index(SIDE_EFFECT_SNAPSHOT, stamp)
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a snapshot of every side effect and its HLT from the API")
+    parser.add_argument("path", help="Snapshot path, a link replaced by one to the new snapshot")
+    parser.add_argument("--chunk-size", type=int, default=SIDE_EFFECT_SNAPSHOT_CHUNK,
+                        help="Drugs or events per request")
+    args = parser.parse_args()
+
+    drug_names = api_call("drug_names", show_error=False)
+    if drug_names is None:
+        raise SystemExit("Failed to fetch drug_names.")
+    names = [*drug_names, *LIFESTYLE_FACTORS]
+    side_effects = fetch_all_side_effects(names, args.chunk_size)
+    if side_effects is None:
+        raise SystemExit("Failed to fetch side_effects.")
+    ancestors = fetch_all_ancestors([row['event_concept_name'] for row in side_effects], args.chunk_size)
+    if ancestors is None:
+        raise SystemExit("Failed to fetch ancestor_side_effects.")
+    build_side_effect_snapshot(side_effects, ancestors, args.path, names)
+    print(f"Wrote {len(side_effects)} side effects to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+VOCABULARY_FILE = "vocabulary.json"
+
+
+def write_snapshot(path, arrays, vocabulary):
+    """ Write integer arrays as .npy files, with the names their codes index, to a snapshot directory
+
+    path is a symbolic link to a new versioned directory beside it, swapped in with os.replace
+    so a lookup always finds a whole snapshot. Running apps that have the old files mapped keep
+    reading them until their next lookup sees the new snapshot_stamp and loads it. The version
+    before is kept for lookups still reading it, and older ones are removed.
+    """
+    path = Path(path)
+    version = path.with_name(f"{path.name}.{time.time_ns()}")
+    version.mkdir(parents=True)
+    for name, values in arrays.items():
+        np.save(version / f"{name}.npy", np.ascontiguousarray(values))
+    (version / VOCABULARY_FILE).write_text(json.dumps(vocabulary))
+
+    previous = path.resolve() if path.is_symlink() else None
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)  # A snapshot written before they were versioned
+    link = path.with_name(f"{path.name}.link")
+    link.unlink(missing_ok=True)
+    link.symlink_to(version.name)
+    os.replace(link, path)
+    for old in path.parent.glob(f"{path.name}.[0-9]*"):
+        if old.is_dir() and old.resolve() not in (version.resolve(), previous):
+            shutil.rmtree(old, ignore_errors=True)
+
+def snapshot_stamp(path):
+    """ Changes whenever the snapshot is rewritten; None when there is no snapshot at path """
+    try:
+        stat = (Path(path) / VOCABULARY_FILE).stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+def read_snapshot(path):
+    """ Arrays of a snapshot directory, memory-mapped read-only, and the names their codes index """
+    path = Path(path).resolve()  # Every file from the same version, even if the snapshot is rewritten meanwhile
+    vocabulary = json.loads((path / VOCABULARY_FILE).read_text())
+    arrays = {file.stem: np.load(file, mmap_mode='r') for file in path.glob("*.npy")}
+    return arrays, vocabulary
+
+def lookup_table(names):
+    """ Object array to index with codes, where the missing code -1 gives None """
+    return np.array([*names, None], dtype=object)
+
+def casefold_groups(names):
+    """ Id of every name, shared by the names that only differ in case, and the id of each casefolded name """
+    ids = {}
+    groups = np.array([ids.setdefault(name.casefold(), len(ids)) for name in names], dtype=np.int64)
+    return groups, ids
+
+def concatenated_ranges(starts, lengths):
+    """ Every index from start to start + length of each range, range after range """
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
@@ -1,34 +1,475 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import requests
 import streamlit as st
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def api_call(endpoint, type="get", params=None, show_error=True):
-    # Use POST method for the interactions endpoint
-    if type == "post":
-        response = requests.post(f"https://ddi-fast-api.onrender.com/{endpoint}", json=params)
-    else:
-        response = requests.get(f"https://ddi-fast-api.onrender.com/{endpoint}", params=params)
-    
-    if response.status_code == 200:
+from constants import (API_BASE_URL, API_POOL_SIZE, API_MAX_RETRIES, API_RETRY_BACKOFF,
+                       API_RETRY_STATUSES, API_MAX_CONCURRENCY, API_DEFAULT_TIMEOUT, API_TIMEOUTS,
+                       API_CACHE_MAX_BYTES, API_CACHE_TTLS, DATA_VERSION, DATA_VERSION_FILE,
+                       DDI_COLUMNS, SIDE_EFFECT_COLUMNS, CATEGORICAL_COLUMNS, SMALL_INTEGER_COLUMNS)
+
+
+class LRUCache:
+    """ Thread-safe LRU cache bounded by total byte size, with optional per-entry TTL """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size, ttl=None):
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+@st.cache_resource(show_spinner=False)  # Runs before set_page_config, which must be the first element
+def get_api_session():
+    """ Process-wide pooled HTTP session, shared by every Streamlit session """
+    retry = Retry(
+        total=API_MAX_RETRIES,
+        read=0,  # A read timeout already waited the full read timeout, so it is not retried
+        backoff_factor=API_RETRY_BACKOFF,
+        status_forcelist=API_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "POST"]),  # All endpoints are read-only
+        raise_on_status=False,  # Hand the final response back so we can report it
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """ Raw API response bodies, shared by every Streamlit session """
+    return LRUCache(API_CACHE_MAX_BYTES)
+
+def data_version():
+    """ Version of the API's datasets, read on every call so a new one in DDI_DATA_VERSION_FILE applies at once """
+    if DATA_VERSION_FILE:
+        try:
+            return f"{DATA_VERSION}/{Path(DATA_VERSION_FILE).read_text().strip()}"
+        except OSError:
+            pass  # Not written yet
+    return DATA_VERSION
+
+def api_cache_stats():
+    """ Hit, miss and eviction counters of the shared API response cache """
+    return get_response_cache().stats()
+
+def api_call(endpoint, type="get", params=None, show_error=True, cache=True):
+    # Callers that cache the response themselves pass cache=False, so it is not held twice
+    ttl = API_CACHE_TTLS.get(endpoint) if cache else None
+    if ttl is not None:
+        # Responses are cached as raw bytes so every caller gets its own fresh objects
+        cache_key = (data_version(), endpoint, type, json.dumps(params, sort_keys=True, separators=(",", ":")))
+        content = get_response_cache().get(cache_key)
+        if content is not None:
+            return json.loads(content)
+
+    session = get_api_session()
+    url = f"{API_BASE_URL}/{endpoint}"
+    timeout = API_TIMEOUTS.get(endpoint, API_DEFAULT_TIMEOUT)
+    try:
+        # Use POST method for the interactions endpoint
+        if type == "post":
+            response = session.post(url, json=params, timeout=timeout)
+        else:
+            response = session.get(url, params=params, timeout=timeout)
+    except requests.RequestException:
+        response = None
+
+    if response is not None and response.status_code == 200:
+        if ttl is not None:
+            get_response_cache().put(cache_key, response.content, len(response.content), ttl=ttl)
         return response.json()
     else:
         if show_error:
             st.error(f"Failed to fetch {endpoint}.")
         return None
+
+def _resolve_shared_resources():
+    # Resolve the cached resources on the script thread before fanning out to workers
+    get_api_session()
+    get_response_cache()
+
+def api_call_many(endpoint, params_list, type="get", show_error=True, cache=True):
+    """ Issue independent calls to one endpoint concurrently, returning results in input order """
+    if not params_list:
+        return []
+    _resolve_shared_resources()
+    workers = min(API_MAX_CONCURRENCY, len(params_list))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Worker threads have no script context, so errors are reported here instead
+        results = list(executor.map(
+            lambda params: api_call(endpoint, type=type, params=params, show_error=False, cache=cache),
+            params_list
+        ))
+    if show_error and any(result is None for result in results):
+        st.error(f"Failed to fetch {endpoint}.")
+    return results
+
+def fetch_admission_details(diagnoses_data):
+    """ Admission details for every distinct hadm_id referenced by a patient's diagnoses """
+    hadm_ids = list(dict.fromkeys(hadm_id for diagnosis in diagnoses_data or [] for hadm_id in diagnosis['hadm_ids']))
+    results = api_call_many("admission_details", [{"hadm_id": hadm_id} for hadm_id in hadm_ids])
+    return {hadm_id: info for hadm_id, info in zip(hadm_ids, results) if info}
+
+def api_lookup(endpoint, keys, fetch):
+    """ Per-key results of a bulk lookup endpoint, cached per key and shared by every session
+
+    fetch is called with only the keys that are not cached yet and must return a value for
+    each of them (None when the API knows nothing about a key), or None if the request failed.
+    Keys whose fetch failed are left out of the result. fetch should call api_call with
+    cache=False, as its response is cached here per key. Anything fetch returns under the
+    key None, such as rows naming none of the keys, is returned under None and stops that
+    fetch from being cached, so every lookup needing those keys fetches and shows it again.
+    """
+    cache = get_response_cache()
+    ttl = API_CACHE_TTLS.get(endpoint)
+    version = data_version()
+    results, missing = {}, []
+    for key in dict.fromkeys(keys):
+        content = cache.get(("lookup", version, endpoint, key))
+        if content is None:
+            missing.append(key)
+        else:
+            results[key] = json.loads(content)
+
+    if missing:
+        fetched = fetch(missing)
+        if fetched is not None and fetched.get(None):
+            results.update({key: fetched.get(key) for key in missing})
+            results[None] = fetched[None]
+        elif fetched is not None:
+            for key in missing:
+                # Stored as JSON like whole responses, so None is cached as a known miss
+                content = json.dumps(fetched.get(key)).encode()
+                cache.put(("lookup", version, endpoint, key), content, len(content), ttl=ttl)
+                results[key] = fetched.get(key)
+    return results
+
+def api_pipeline(stages, show_error=True):
+    """ Run fetch stages concurrently, starting each one as soon as its dependencies have finished
+
+    stages maps an endpoint name to (func, dependencies); func is called with the results of
+    its dependencies as positional arguments and should call api_call with show_error=False.
+    A stage is skipped when any of its dependencies came back empty. Returns the results and
+    the wall-clock duration of each stage in milliseconds.
+    """
+    results, timings = {}, {}
+    if not stages:
+        return results, timings
+    _resolve_shared_resources()
+
+    def timed(name, func, args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    pending = dict(stages)
+    running = {}
+    skipped = set()
+    with ThreadPoolExecutor(max_workers=min(API_MAX_CONCURRENCY, len(stages))) as executor:
+        while pending or running:
+            for name, (func, dependencies) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    del pending[name]
+                    args = [results[dependency] for dependency in dependencies]
+                    if all(args):
+                        running[executor.submit(timed, name, func, args)] = name
+                    else:
+                        results[name] = None
+                        skipped.add(name)
+            if not running:
+                if pending:
+                    raise ValueError(f"Unresolvable stage dependencies: {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    if show_error:
+        for name in stages:
+            if results[name] is None and name not in skipped:
+                st.error(f"Failed to fetch {name}.")
+    return results, timings
     
+def _matching_names(names):
+    """ Map a name as the API spells it back to the requested name """
+    by_casefold = {name.casefold(): name for name in names}
+    return lambda name: by_casefold.get(name.casefold(), name)
+
+def fetch_side_effects(drug_list):
+    """ Side effect rows of every drug, requesting only drugs not already cached
+
+    Returns None if the request for the missing drugs failed.
+    """
+    drugs = list(dict.fromkeys(drug_list))
+
+    def fetch(missing):
+        side_effects = api_call("side_effects", params={"drug_list": missing}, show_error=False, cache=False)
+        if side_effects is None:
+            return None
+        requested = _matching_names(missing)
+        by_drug = {drug: [] for drug in missing}
+        for item in side_effects:
+            drug = requested(item['drug_concept_name'])
+            by_drug.setdefault(drug if drug in by_drug else None, []).append(item)
+        return by_drug
+
+    by_drug = api_lookup("side_effects", drugs, fetch)
+    if any(drug not in by_drug for drug in drugs):
+        return None
+    return [item for drug in drugs for item in by_drug[drug]] + by_drug.get(None, [])
+
+def fetch_ancestors(event_names):
+    """ Higher level term of every side effect, requesting only terms not already cached """
+    events = list(dict.fromkeys(event_names))
+
+    def fetch(missing):
+        return api_call("ancestor_side_effects", params={"pt_list": missing}, show_error=False, cache=False)
+
+    ancestors = api_lookup("ancestor_side_effects", events, fetch)
+    if any(event not in ancestors for event in events):
+        return None
+    return {event: ancestor for event, ancestor in ancestors.items() if ancestor is not None}
+
+def fetch_interactions(drug_list, involving=None):
+    """ Interaction rows between every pair of drugs, requesting only pairs not already cached
+
+    The missing pairs are fetched with one interactions request for the drugs they involve,
+    so adding a drug to a search requests the new drug and its partners, and removing one
+    requests nothing. With involving, only the pairs with one of those drugs are returned.
+    Returns None if the request failed.
+    """
+    drugs = list(dict.fromkeys(drug_list))
+    # Keyed by the sorted pair, so searches listing the drugs in any order share entries
+    pairs = [tuple(sorted((drug_a, drug_b))) for i, drug_a in enumerate(drugs) for drug_b in drugs[i + 1:]]
+    if involving is not None:
+        involving = set(involving)
+        pairs = [pair for pair in pairs if involving.intersection(pair)]
+
+    def fetch(missing):
+        involved = {drug for pair in missing for drug in pair}
+        rows = api_call("interactions", params={"drug_list": [drug for drug in drugs if drug in involved]},
+                        show_error=False, cache=False)
+        if rows is None:
+            return None
+        requested = _matching_names(involved)
+        by_pair = {pair: [] for pair in missing}
+        for row in rows:
+            names = (requested(row['drug_a_concept_name']), requested(row['drug_b_concept_name']))
+            if not all(name in involved for name in names):
+                by_pair.setdefault(None, []).append(row)
+            elif tuple(sorted(names)) in by_pair:
+                by_pair[tuple(sorted(names))].append(row)  # Pairs that were not missing are cached already
+        return by_pair
+
+    by_pair = api_lookup("interactions", pairs, fetch)
+    if any(pair not in by_pair for pair in pairs):
+        return None
+    return [row for pair in pairs for row in by_pair[pair]] + by_pair.get(None, [])
+
+def _categorical(values):
+    """ Categorical of text values, keeping object categories when every value is missing """
+    values = values if isinstance(values, pd.Categorical) else pd.Categorical(values)
+    if values.categories.dtype == object:
+        return values
+    # pandas infers float64 categories from all-None values, which union_categoricals will not mix with text
+    return pd.Categorical.from_codes(values.codes, dtype=pd.CategoricalDtype(values.categories.astype(object)))
+
+def _typed_frame(rows, columns):
+    """ DataFrame of the given columns built straight from API rows, with compact column dtypes """
+    data = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        if column in CATEGORICAL_COLUMNS:
+            data[column] = _categorical(values)
+        elif column in SMALL_INTEGER_COLUMNS:
+            # Smallest integer type that fits, or float if any value is missing
+            data[column] = pd.to_numeric(pd.Series(values, dtype=object), downcast='integer')
+        else:
+            data[column] = pd.Series(values, dtype=object)
+    return pd.DataFrame(data, columns=columns)
+
+def load_interactions(interactions):
+    """ Interaction rows as a typed DataFrame of DDI_COLUMNS """
+    return _typed_frame(interactions, DDI_COLUMNS)
+
+def load_side_effects(side_effects, ancestors):
+    """ Side effect rows as a typed DataFrame of SIDE_EFFECT_COLUMNS, plus each event's higher level term """
+    df = _typed_frame(side_effects, SIDE_EFFECT_COLUMNS)
+    # Look up each distinct event once and reuse the event codes for the ancestor column
+    events = df['event_concept_name'].array
+    event_ancestors = _categorical([(ancestors or {}).get(event) for event in events.categories])
+    codes = np.append(event_ancestors.codes, -1)[events.codes]
+    df['ancestor'] = pd.Categorical.from_codes(codes, dtype=event_ancestors.dtype)
+    return df
+
+def _filled(length, value):
+    """ Object array holding one shared value, where np.full would create a copy per element """
+    values = np.empty(length, dtype=object)
+    values.fill(value)
+    return values
+
+def _values(series):
+    """ Categorical for categorical columns, otherwise the NumPy array """
+    return series.array if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+
+def _as_categorical(values, length):
+    if values is None:
+        return pd.Categorical.from_codes(np.full(length, -1), categories=pd.Index([], dtype=object))
+    return _categorical(values)
+
 def join_interactions_and_side_effects(interactions_df, side_effects_df):
+    """ Interaction side effects, labelled 'drug a + drug b', followed by the drug side effects """
     # Extract interaction side effects and add required columns
-    interactions_side_effects = pd.DataFrame({
-        'drug_concept_name': interactions_df.apply(
-            lambda x: f"{x['drug_a_concept_name']} + {x['drug_b_concept_name']}", 
-            axis=1
-        ),
-        'event_concept_name': interactions_df['event_concept_name'],
-        'frequency': 'Not reported (Interaction Effect)',  # We do not have frequency data here
-        'source': 'interaction',  # This is BNF or Theasurus, not currently displayed.
-        'severity_code': interactions_df['severity_code']
-    })
-    
-    # Concatenate with side effects, ensuring same columns
-    return pd.concat([interactions_side_effects, side_effects_df], ignore_index=True)
+    interactions_side_effects = {
+        # Vectorised label, formatted as an f-string would (None -> 'None')
+        'drug_concept_name': (interactions_df['drug_a_concept_name'].astype(str) + ' + ' +
+                              interactions_df['drug_b_concept_name'].astype(str)).to_numpy(),
+        'event_concept_name': _values(interactions_df['event_concept_name']),
+        'frequency': _filled(len(interactions_df), 'Not reported (Interaction Effect)'),  # We do not have frequency data here
+        'source': _filled(len(interactions_df), 'interaction'),  # This is BNF or Theasurus, not currently displayed.
+        'severity_code': _values(interactions_df['severity_code']),
+    }
+
+    # Concatenate with side effects, copying the text columns once into a single pre-allocated
+    # block that pandas can use as is. Columns only one side has are padded with NaN, which
+    # makes integer columns float as pd.concat would
+    n_interactions, n_rows = len(interactions_df), len(interactions_df) + len(side_effects_df)
+    columns = list(dict.fromkeys([*interactions_side_effects, *side_effects_df.columns]))
+    parts = {column: (interactions_side_effects.get(column),
+                      _values(side_effects_df[column]) if column in side_effects_df else None)
+             for column in columns}
+
+    def dtype(part):
+        return np.dtype(float) if part is None else part.dtype
+
+    # Typed frames keep their categorical columns categorical, over the union of both sides' values
+    categorical_columns = [column for column, (top, bottom) in parts.items()
+                           if isinstance(top, pd.Categorical) or isinstance(bottom, pd.Categorical)]
+    text_columns = [column for column, (top, bottom) in parts.items() if column not in categorical_columns
+                    and np.result_type(dtype(top), dtype(bottom)) == object]
+    block = np.empty((len(text_columns), n_rows), dtype=object)
+    for row, column in enumerate(text_columns):
+        for part, rows in zip(parts[column], (slice(None, n_interactions), slice(n_interactions, None))):
+            block[row, rows] = np.nan if part is None else part
+    joined = pd.DataFrame(block.T, columns=text_columns, dtype=object, copy=False)
+
+    # Categorical and numeric columns (severity_code) are small by comparison and go in as their own blocks
+    for position, column in enumerate(columns):
+        if column in text_columns:
+            continue
+        top, bottom = parts[column]
+        if column in categorical_columns:
+            values = union_categoricals([_as_categorical(top, n_interactions),
+                                         _as_categorical(bottom, len(side_effects_df))], sort_categories=True)
+        else:
+            values = np.concatenate([
+                np.full(n_interactions, np.nan) if top is None else top,
+                np.full(len(side_effects_df), np.nan) if bottom is None else bottom,
+            ])
+        joined.insert(position, column, values)
+    return joined
+
+def select_page(df, page_size, key, label="Rows"):
+    """ Rows of the page picked in a selector above the content, or all of them when they fit on one page """
+    if not page_size or len(df) <= page_size:
+        return df
+    start = st.selectbox(
+        label,
+        range(0, len(df), page_size),
+        format_func=lambda start: f"{start + 1}–{min(start + page_size, len(df))} of {len(df)}",
+        key=key,
+    )
+    return df.iloc[start:start + page_size]
+
+def _name_pattern(names):
+    """ Regex matching any of the names, lower-cased, inside a lower-cased drug or 'a + b' pair name """
+    # A name with a run of spaces can never match: the names are split on runs of spaces
+    # (str.split treats ' + ' as a regex) before the old substring test
+    names = {name.strip().lower() for name in names if '  ' not in name.strip()}
+    if not names:
+        return None
+    return re.compile('|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True)))
+
+def partition_side_effects(side_effects_df, selected_factors, vaccines):
+    """ Split side effect rows into those due to the selected drugs only, to lifestyle factors
+    and to vaccines, by whether a factor or vaccine name appears in the drug name
 
+    Rows naming both a factor and a vaccine are in both of the last two frames.
+    """
+    names = side_effects_df['drug_concept_name'].str.lower()
+    masks = []
+    for pattern in (_name_pattern(selected_factors), _name_pattern(vaccines)):
+        if pattern is None:
+            masks.append(pd.Series(False, index=side_effects_df.index))
+        else:
+            masks.append(names.str.contains(pattern, na=False))
+    lifestyle, vaccine = masks
+    return side_effects_df[~(lifestyle | vaccine)], side_effects_df[lifestyle], side_effects_df[vaccine]